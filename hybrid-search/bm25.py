@@ -0,0 +1,180 @@
+"""
+Native BM25 engine - inverted index with top-k heap selection.
+
+Drop-in replacement for rank_bm25.BM25Okapi (what BM25Retriever uses):
+same tokenization, IDF, epsilon floor and scoring formula, so scores are
+bit-identical and rankings match up to the order of exactly tied scores.
+Only documents containing a query term are scored, instead of the whole corpus.
+Run this file to check scores and rankings against rank_bm25 on a random corpus.
+"""
+
+import argparse
+import heapq
+import math
+import random
+from array import array
+
+
+def tokenize(text: str) -> list[str]:
+    """Whitespace tokenizer (same as BM25Retriever's default preprocessing)."""
+    return text.split()
+
+
+class BM25Engine:
+    """
+    Okapi BM25 over an inverted index.
+    Posting lists are stored as compact unsigned-int arrays (doc ids, term frequencies).
+    """
+
+    def __init__(self, corpus: list[list[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.corpus_size = len(corpus)
+
+        doc_ids = {}
+        term_freqs = {}
+        doc_len = array("I")
+        for doc_id, tokens in enumerate(corpus):
+            doc_len.append(len(tokens))
+            frequencies = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            for term, freq in frequencies.items():
+                if term not in doc_ids:
+                    doc_ids[term] = array("I")
+                    term_freqs[term] = array("I")
+                doc_ids[term].append(doc_id)
+                term_freqs[term].append(freq)
+
+        self.postings = {term: (doc_ids[term], term_freqs[term]) for term in doc_ids}
+        self.avgdl = sum(doc_len) / self.corpus_size if self.corpus_size else 0.0
+
+        # Per-document length normalisation, precomputed once (same expression as rank_bm25)
+        self._norms = array("d", (
+            self.k1 * (1 - self.b + self.b * dl / self.avgdl) for dl in doc_len
+        ))
+        self.idf = self._calc_idf()
+
+    def _calc_idf(self) -> dict[str, float]:
+        """IDF per term; negative values are floored to epsilon * average IDF."""
+        idf = {}
+        negative = []
+        for term, (ids, _) in self.postings.items():
+            freq = len(ids)
+            value = math.log(self.corpus_size - freq + 0.5) - math.log(freq + 0.5)
+            idf[term] = value
+            if value < 0:
+                negative.append(term)
+        if idf:
+            # Plain running total like rank_bm25: sum() of floats is compensated from Python 3.12
+            idf_sum = 0.0
+            for value in idf.values():
+                idf_sum += value
+            eps = self.epsilon * (idf_sum / len(idf))
+            for term in negative:
+                idf[term] = eps
+        return idf
+
+    def _term_scores(self, term: str) -> list[tuple[int, float]] | None:
+        """(doc id, score contribution) for every document containing the term."""
+        posting = self.postings.get(term)
+        if posting is None:
+            return None
+        idf = self.idf[term]
+        k1_plus_1 = self.k1 + 1
+        norms = self._norms
+        return [
+            (doc_id, idf * (freq * k1_plus_1 / (freq + norms[doc_id])))
+            for doc_id, freq in zip(*posting)
+        ]
+
+    def get_scores(self, query: list[str], term_cache: dict = None) -> dict[int, float]:
+        """
+        Scores for documents containing at least one query term (all others score 0).
+        Pass a shared `term_cache` to reuse per-term contributions across queries.
+        """
+        scores = {}
+        for term in query:
+            if term_cache is None:
+                contributions = self._term_scores(term)
+            else:
+                if term not in term_cache:
+                    term_cache[term] = self._term_scores(term)
+                contributions = term_cache[term]
+            if contributions is None:
+                continue
+            for doc_id, contribution in contributions:
+                scores[doc_id] = scores.get(doc_id, 0.0) + contribution
+        return scores
+
+    def top_k(self, query: list[str], k: int = 5, term_cache: dict = None) -> list[int]:
+        """
+        Return the ids of the top-k documents, best first.
+        Ties are broken by higher doc id first (rank_bm25's unstable argsort leaves
+        them in arbitrary order); documents without query terms (score 0) fill in
+        when too few match, as they do in rank_bm25.
+        """
+        k = min(k, self.corpus_size)
+        if k <= 0:
+            return []
+
+        scores = self.get_scores(query, term_cache)
+        top = heapq.nlargest(k, ((score, doc_id) for doc_id, score in scores.items()))
+
+        if len(top) < k or top[-1][0] <= 0:
+            zero_scored = []
+            for doc_id in range(self.corpus_size - 1, -1, -1):
+                if len(zero_scored) == k:
+                    break
+                if doc_id not in scores:
+                    zero_scored.append((0.0, doc_id))
+            top = heapq.nlargest(k, top + zero_scored)
+
+        return [doc_id for _, doc_id in top]
+
+    def top_k_many(self, queries: list[list[str]], k: int = 5) -> list[list[int]]:
+        """top_k for a batch of queries; each distinct term's postings are scored once."""
+        term_cache = {}
+        return [self.top_k(query, k, term_cache) for query in queries]
+
+
+def compare_with_rank_bm25(corpus: list[list[str]], queries: list[list[str]]) -> dict:
+    """Count queries whose scores or top-10 rankings differ from rank_bm25.BM25Okapi."""
+    from rank_bm25 import BM25Okapi
+    reference = BM25Okapi(corpus)
+    engine = BM25Engine(corpus)
+    score_diffs = ranking_diffs = 0
+    for query in queries:
+        expected = reference.get_scores(query)
+        scores = engine.get_scores(query)
+        if any(scores.get(doc_id, 0.0) != expected[doc_id] for doc_id in range(len(corpus))):
+            score_diffs += 1
+        expected_top = sorted(range(len(corpus)), key=lambda doc_id: (-expected[doc_id], -doc_id))[:10]
+        if engine.top_k(query, 10) != expected_top:
+            ranking_diffs += 1
+    return {"queries": len(queries), "score_diffs": score_diffs, "ranking_diffs": ranking_diffs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check BM25Engine against rank_bm25 on a random corpus")
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--vocab", type=int, default=300, help="Small vocabularies produce negative-IDF terms")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = [f"t{i}" for i in range(args.vocab)]
+    # Zipf-like term weights so common terms appear in most documents
+    weights = [1.0 / (i + 1) for i in range(args.vocab)]
+    corpus = [rng.choices(vocab, weights, k=rng.randint(5, 60)) for _ in range(args.docs)]
+    queries = [rng.choices(vocab, weights, k=rng.randint(1, 6)) for _ in range(args.queries)]
+
+    result = compare_with_rank_bm25(corpus, queries)
+    print(f"{result['queries']} queries: {result['score_diffs']} score vectors differ, "
+          f"{result['ranking_diffs']} rankings differ")
+
+
+if __name__ == "__main__":
+    main()
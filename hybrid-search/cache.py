@@ -0,0 +1,152 @@
+"""
+Caches shared by retrieval, ingestion and evals.
+
+DiskCache is a small SQLite-backed key/value store: it survives restarts,
+is safe to share between threads, and evicts least-recently-used entries
+once it grows past `max_entries`.
+
+LRUCache is the in-process counterpart for hot values (query vectors, results).
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if over capacity."""
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+        }
+
+
+class DiskCache:
+    """Persistent key -> bytes store with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached value or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        """Return {key: value} for the keys that are cached."""
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, value FROM cache WHERE key IN ({marks})", batch)
+                found.update(rows.fetchall())
+                if found:
+                    self._conn.execute(
+                        f"UPDATE cache SET accessed = ? WHERE key IN ({marks})", [time.time(), *batch]
+                    )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: bytes):
+        """Store a value (existing keys are left as they are)."""
+        self.set_many({key: value})
+
+    def set_many(self, items: dict[str, bytes]):
+        """Store several values, evicting the least recently used entries if over capacity."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO cache (key, value, accessed) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()]
+            )
+            self._size += max(cursor.rowcount, 0)
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the oldest entries, leaving 10% headroom so eviction is not run on every write."""
+        self._size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess = self._size - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)", (excess,)
+            )
+            self._size -= excess
+
+    def items(self) -> list[tuple[str, bytes]]:
+        """Every (key, value) pair (does not touch access times or counters)."""
+        with self._lock:
+            return self._conn.execute("SELECT key, value FROM cache").fetchall()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": self._size,
+        }
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
@@ -2,9 +2,34 @@
 Custom embeddings wrapper for nomic-embed-text with proper prefixes.
 """
 
+import hashlib
+import os
+from array import array
+
 from langchain_ollama import OllamaEmbeddings
 from langchain_core.embeddings import Embeddings
 
+from cache import DiskCache, LRUCache
+
+# Optional persistent embedding cache (disabled unless a path is set)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+_embedding_cache = None
+
+
+def get_embedding_cache() -> DiskCache | None:
+    """Return the process-wide on-disk embedding cache, or None if EMBEDDING_CACHE_PATH is unset."""
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_PATH:
+        _embedding_cache = DiskCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+    return _embedding_cache
+
+
+def normalize_query(text: str) -> str:
+    """Collapse runs of whitespace (queries that differ only in spacing are the same query)."""
+    return " ".join(text.split())
+
 
 class NomicEmbeddings(Embeddings):
     """Wrapper for OllamaEmbeddings that adds nomic-embed-text prefixes.
@@ -12,13 +37,56 @@ class NomicEmbeddings(Embeddings):
     nomic-embed-text is a dual-encoder model that requires:
     - 'search_document:' prefix for documents being indexed
     - 'search_query:' prefix for queries during retrieval
+
+    If a DiskCache is given, vectors are cached by model, prefix mode and text hash,
+    so repeated texts skip Ollama entirely. A LRUCache `query_cache` additionally keeps
+    recent query vectors in memory, keyed by whitespace-normalized query text.
     """
 
     # add boolean to control the prefix for testing purposes
     ADD_PREFIX = True
 
-    def __init__(self, model: str, base_url: str):
+    def __init__(self, model: str, base_url: str, cache: DiskCache = None, query_cache: LRUCache = None):
+        self.model = model
         self._embeddings = OllamaEmbeddings(model=model, base_url=base_url)
+        self._cache = cache
+        self._query_cache = query_cache
+
+    def _cache_key(self, text: str) -> str:
+        """Key for an already-prefixed text."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}|prefix={int(self.ADD_PREFIX)}|{digest}"
+
+    def _split_cached(self, texts: list[str]) -> tuple[list[str], dict, list[tuple[str, str]]]:
+        """Look prefixed texts up in the disk cache: (keys, cached {key: bytes}, missing [(key, text)])."""
+        keys = [self._cache_key(text) for text in texts]
+        cached = self._cache.get_many(list(set(keys)))
+        missing = list({key: text for key, text in zip(keys, texts) if key not in cached}.items())
+        return keys, cached, missing
+
+    def _merge_cached(self, keys: list[str], cached: dict, missing: list, vectors: list) -> list[list[float]]:
+        """Store freshly embedded misses and return vectors in input order."""
+        if missing:
+            fresh = {key: array("d", vector).tobytes() for (key, _), vector in zip(missing, vectors)}
+            self._cache.set_many(fresh)
+            cached.update(fresh)
+        return [array("d", cached[key]).tolist() for key in keys]
+
+    def _embed_cached(self, texts: list[str]) -> list[list[float]]:
+        """Embed prefixed texts, only sending cache misses to Ollama."""
+        if self._cache is None:
+            return self._embeddings.embed_documents(texts)
+        keys, cached, missing = self._split_cached(texts)
+        vectors = self._embeddings.embed_documents([text for _, text in missing]) if missing else []
+        return self._merge_cached(keys, cached, missing, vectors)
+
+    async def _aembed_cached(self, texts: list[str]) -> list[list[float]]:
+        """Async _embed_cached (Ollama's async client; cache lookups are local)."""
+        if self._cache is None:
+            return await self._embeddings.aembed_documents(texts)
+        keys, cached, missing = self._split_cached(texts)
+        vectors = await self._embeddings.aembed_documents([text for _, text in missing]) if missing else []
+        return self._merge_cached(keys, cached, missing, vectors)
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embed documents with 'search_document:' prefix."""
@@ -26,12 +94,75 @@ class NomicEmbeddings(Embeddings):
             prefixed = [f"search_document: {text}" for text in texts]
         else:
             prefixed = texts
-        return self._embeddings.embed_documents(prefixed)
+        return self._embed_cached(prefixed)
+
+    def _query_key(self, text: str) -> tuple:
+        """In-memory cache key for an already-normalized query."""
+        return self.model, self.ADD_PREFIX, text
 
     def embed_query(self, text: str) -> list[float]:
         """Embed query with 'search_query:' prefix."""
+        # Whitespace variants share one vector; the normalized text is what gets embedded,
+        # so a cache hit returns exactly what a miss would (case is kept: the model is case-sensitive)
+        text = normalize_query(text)
+        if self._query_cache is not None:
+            key = self._query_key(text)
+            vector = self._query_cache.get(key)
+            if vector is None:
+                vector = self._embed_query(text)
+                self._query_cache.set(key, vector)
+            return vector
+        return self._embed_query(text)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed many queries with 'search_query:' prefix in one Ollama batch request."""
+        texts = [normalize_query(text) for text in texts]
+        vectors = [None] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            key = self._query_key(text)
+            cached = self._query_cache.get(key) if self._query_cache is not None else None
+            if cached is not None:
+                vectors[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            originals = [texts[indexes[0]] for indexes in pending.values()]
+            prefixed = [f"search_query: {text}" for text in originals] if self.ADD_PREFIX else originals
+            for (key, indexes), vector in zip(pending.items(), self._embed_cached(prefixed)):
+                if self._query_cache is not None:
+                    self._query_cache.set(key, vector)
+                for i in indexes:
+                    vectors[i] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Async embed_documents."""
+        if self.ADD_PREFIX:
+            prefixed = [f"search_document: {text}" for text in texts]
+        else:
+            prefixed = texts
+        return await self._aembed_cached(prefixed)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Async embed_query (shares the query and disk caches)."""
+        text = normalize_query(text)
+        key = self._query_key(text)
+        vector = self._query_cache.get(key) if self._query_cache is not None else None
+        if vector is None:
+            prefixed = f"search_query: {text}" if self.ADD_PREFIX else text
+            vector = (await self._aembed_cached([prefixed]))[0]
+            if self._query_cache is not None:
+                self._query_cache.set(key, vector)
+        return vector
+
+    def _embed_query(self, text: str) -> list[float]:
+        """Embed one query, going through the disk cache if configured."""
         if self.ADD_PREFIX:
             prefixed = f"search_query: {text}"
         else:
             prefixed = text
-        return self._embeddings.embed_query(prefixed)
\ No newline at end of file
+        if self._cache is None:
+            return self._embeddings.embed_query(prefixed)
+        return self._embed_cached([prefixed])[0]
@@ -0,0 +1,220 @@
+"""
+Latency Benchmark - what bm25_search, vector_search and hybrid_search cost.
+
+Replays EVAL_QUESTIONS (or a query file, one query per line) serially and reports
+p50/p95/p99 latency per method and per hybrid stage (embed, bm25, vector, fusion).
+The in-process query-vector and result caches are emptied before every call, so each
+number is the real work: the cold pass runs on a fresh session (its corpus load is
+reported as "startup"), warm passes reuse the session, indexes and connections.
+--cache-runs adds a separately reported "cached" phase that measures cache hits.
+Also reports peak RSS. Use --output to save the report as JSON and compare runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embeddings import get_embedding_cache
+from retrieval import (
+    BM25_ENGINE, VECTOR_BACKEND, RetrievalSession, query_embedding_cache, result_cache,
+)
+from questions import EVAL_QUESTIONS
+
+load_dotenv()
+
+METHODS = ["bm25", "vector", "hybrid"]
+HYBRID_STAGES = ["embed", "bm25", "vector", "fusion"]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency percentiles in milliseconds for a list of durations in seconds."""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_queries(path: str = None) -> list[str]:
+    """Queries from a file (one per line, blank lines skipped), else EVAL_QUESTIONS."""
+    if not path:
+        return list(EVAL_QUESTIONS)
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def clear_caches():
+    """Empty the in-process query-vector and result caches."""
+    query_embedding_cache.clear()
+    result_cache.clear()
+
+
+def run_pass(session: RetrievalSession, queries: list[str], k: int, use_cache: bool = False) -> dict:
+    """
+    One serial pass of every method over the queries; returns raw durations in seconds.
+    Unless `use_cache`, caches are emptied before every call, so one method's query vector
+    or fused result never makes the next one look cheaper.
+    """
+    samples = {
+        "methods": {method: [] for method in METHODS},
+        "hybrid_stages": {stage: [] for stage in HYBRID_STAGES},
+        "hybrid_result_cache_hits": 0,
+    }
+    for query in queries:
+        for method in METHODS:
+            if not use_cache:
+                clear_caches()
+            timings = {}
+            start = time.perf_counter()
+            if method == "bm25":
+                session.bm25_search(query, k=k)
+            elif method == "vector":
+                session.vector_search(query, k=k)
+            else:
+                session.hybrid_search(query, k=k, timings=timings)
+            samples["methods"][method].append(time.perf_counter() - start)
+
+        # Stage times only mean something when the search actually ran
+        if timings["cached"]:
+            samples["hybrid_result_cache_hits"] += 1
+        else:
+            for stage in HYBRID_STAGES:
+                samples["hybrid_stages"][stage].append(timings[stage])
+    return samples
+
+
+def merge_samples(passes: list[dict]) -> dict:
+    """Concatenate the raw durations of several passes."""
+    return {
+        "methods": {method: [s for p in passes for s in p["methods"][method]] for method in METHODS},
+        "hybrid_stages": {stage: [s for p in passes for s in p["hybrid_stages"][stage]] for stage in HYBRID_STAGES},
+        "hybrid_result_cache_hits": sum(p["hybrid_result_cache_hits"] for p in passes),
+    }
+
+
+def summarize_samples(samples: dict) -> dict:
+    """Percentiles per method and stage, plus serial throughput (queries per second) per method."""
+    return {
+        "methods": {
+            method: {**summarize(durations), "qps": len(durations) / sum(durations) if durations else 0.0}
+            for method, durations in samples["methods"].items()
+        },
+        "hybrid_stages": {stage: summarize(durations) for stage, durations in samples["hybrid_stages"].items()},
+        "hybrid_result_cache_hits": samples["hybrid_result_cache_hits"],
+    }
+
+
+def run_benchmark(queries: list[str], k: int = 5, warm_runs: int = 3, cache_runs: int = 0) -> dict:
+    """
+    Cold pass on a fresh session, then `warm_runs` passes reusing it (caches emptied per call).
+    With `cache_runs`, one priming pass fills the caches and that many more measure the hit path.
+    """
+    clear_caches()
+    session = RetrievalSession()
+    start = time.perf_counter()
+    session.refresh(force=True)
+    startup = time.perf_counter() - start
+
+    cold = run_pass(session, queries, k)
+    warm = merge_samples([run_pass(session, queries, k) for _ in range(warm_runs)])
+
+    cached = None
+    if cache_runs:
+        run_pass(session, queries, k, use_cache=True)
+        cached = merge_samples([run_pass(session, queries, k, use_cache=True) for _ in range(cache_runs)])
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "queries": len(queries),
+            "k": k,
+            "warm_runs": warm_runs,
+            "cache_runs": cache_runs,
+            # Not cleared between calls: with it on, embed times are disk-cache lookups
+            "embedding_disk_cache": get_embedding_cache() is not None,
+            "vector_backend": VECTOR_BACKEND,
+            "bm25_engine": BM25_ENGINE,
+            "python": platform.python_version(),
+        },
+        "documents": len(session.documents),
+        "startup_seconds": startup,
+        "cold": summarize_samples(cold),
+        "warm": summarize_samples(warm) if warm_runs else None,
+        "cached": summarize_samples(cached) if cached else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: dict):
+    """Human-readable tables for the cold, warm and (optional) cached phases."""
+    print(f"{report['documents']} documents, startup {report['startup_seconds']:.2f}s, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB")
+    if report["config"]["embedding_disk_cache"]:
+        print("Note: EMBEDDING_CACHE_PATH is set, so embed times include persistent cache hits")
+
+    for phase in ("cold", "warm", "cached"):
+        results = report[phase]
+        if results is None:
+            continue
+        print(f"\n{phase.upper()}" + (" (in-process caches on)" if phase == "cached" else ""))
+        print(f"  {'':14} {'p50':>8} {'p95':>8} {'p99':>8} {'qps':>8}")
+        for method, stats in results["methods"].items():
+            if stats["count"]:
+                print(f"  {method:14} {stats['p50_ms']:7.1f}ms {stats['p95_ms']:7.1f}ms "
+                      f"{stats['p99_ms']:7.1f}ms {stats['qps']:8.1f}")
+        for stage, stats in results["hybrid_stages"].items():
+            if stats["count"]:
+                print(f"  {'hybrid/' + stage:14} {stats['p50_ms']:7.1f}ms {stats['p95_ms']:7.1f}ms "
+                      f"{stats['p99_ms']:7.1f}ms")
+        if results["hybrid_result_cache_hits"]:
+            print(f"  (hybrid served from the result cache {results['hybrid_result_cache_hits']} times)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmark for the retrieval methods")
+    parser.add_argument("--queries", help="Query file, one query per line (default: EVAL_QUESTIONS)")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--warm-runs", type=int, default=3, help="Warm passes after the cold one")
+    parser.add_argument("--cache-runs", type=int, default=0,
+                        help="Extra passes with the query/result caches left on, reported as a separate phase")
+    parser.add_argument("--output", help="Write the full report as JSON to this path")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("RETRIEVAL BENCHMARK")
+    print("=" * 50)
+
+    report = run_benchmark(load_queries(args.queries), k=args.k, warm_runs=args.warm_runs, cache_runs=args.cache_runs)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Load Test - where do hybrid_search and generate_answer saturate under concurrent users?
+
+Drives a target with increasing load, one level at a time:
+    --concurrency 1 2 4 8   closed loop: N users, each sends the next query when the last returns
+    --qps 1 2 5 10          open loop: requests start on a fixed schedule whether or not earlier
+                            ones finished (latency counts from the scheduled start)
+
+Targets run in-process (hybrid, answer) or against server.py over HTTP (http-search,
+http-answer). In-process targets run with the query-vector and result caches off unless
+--cache is given; a cycling query list would otherwise measure LRU lookups. For HTTP
+targets, start server.py with RESULT_CACHE_SIZE=0 QUERY_CACHE_SIZE=0; the report records
+the server's cache sizes from /health either way. MongoDB and Ollama come from
+MONGO_DB_URL / OLLAMA_BASE_URL, so either can point at a local stand-in (see README).
+Each level reports throughput, latency percentiles, error rate and a per-second timeline;
+the knee is the first level where p95 latency or throughput stops scaling.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from dotenv import load_dotenv
+
+from evals.benchmark import load_queries, summarize
+
+load_dotenv()
+
+TARGETS = ["hybrid", "answer", "http-search", "http-answer"]
+DEFAULT_URL = f"http://localhost:{os.getenv('SERVER_PORT', '8000')}"
+
+
+def disable_caches():
+    """Turn off this process's query-vector and result caches (entries are evicted as soon as they are stored)."""
+    from retrieval import query_embedding_cache, result_cache
+    for cache in (query_embedding_cache, result_cache):
+        cache.max_entries = 0
+        cache.clear()
+
+
+def cache_state(target_name: str, url: str = DEFAULT_URL) -> dict:
+    """Query-vector and result cache sizes the target runs with (0 = off)."""
+    if target_name.startswith("http"):
+        try:
+            with urllib.request.urlopen(url.rstrip("/") + "/health", timeout=10) as response:
+                health = json.loads(response.read())
+            return {"result_cache_size": health.get("result_cache_size"),
+                    "query_cache_size": health.get("query_cache_size")}
+        except (OSError, ValueError):
+            return {"result_cache_size": None, "query_cache_size": None}
+    from retrieval import query_embedding_cache, result_cache
+    return {"result_cache_size": result_cache.max_entries, "query_cache_size": query_embedding_cache.max_entries}
+
+
+def make_target(name: str, k: int = 5, url: str = DEFAULT_URL, timeout: float = 120.0):
+    """Return a callable(query) that performs one request against the target (raises on failure)."""
+    if name == "hybrid":
+        from retrieval import get_default_session
+        session = get_default_session()
+        session.refresh(force=True)
+        return lambda query: session.hybrid_search(query, k=k)
+
+    if name == "answer":
+        from generation import generate_answer
+        return lambda query: generate_answer(query, k=k)
+
+    if name in ("http-search", "http-answer"):
+        path, field = ("/search", "query") if name == "http-search" else ("/answer", "question")
+
+        def post(query: str):
+            body = json.dumps({field: query, "k": k}).encode()
+            request = urllib.request.Request(
+                url.rstrip("/") + path, data=body, headers={"Content-Type": "application/json"}
+            )
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.read()
+        return post
+
+    raise ValueError(f"Unknown target: {name} (expected one of {TARGETS})")
+
+
+def _call(target, query: str, scheduled: float, origin: float) -> tuple[float, float, str | None]:
+    """(start offset, latency, error) for one request; latency counts from `scheduled`."""
+    try:
+        target(query)
+        error = None
+    except urllib.error.HTTPError as e:
+        error = f"HTTP {e.code}"
+    except Exception as e:
+        error = type(e).__name__
+    return scheduled - origin, time.perf_counter() - scheduled, error
+
+
+def run_closed_loop(target, queries: list[str], concurrency: int, duration: float) -> list[tuple]:
+    """`concurrency` users back to back for `duration` seconds."""
+    next_query = itertools.cycle(queries).__next__
+    lock = threading.Lock()
+    samples = []
+    origin = time.perf_counter()
+    deadline = origin + duration
+
+    def user():
+        while time.perf_counter() < deadline:
+            with lock:
+                query = next_query()
+            sample = _call(target, query, time.perf_counter(), origin)
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def run_open_loop(target, queries: list[str], qps: float, duration: float, max_workers: int = 64) -> list[tuple]:
+    """
+    Start requests at a fixed rate for `duration` seconds. Requests that wait for a free
+    worker count that wait as latency, so overload shows up instead of being hidden.
+    """
+    interval = 1.0 / qps
+    origin = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load") as pool:
+        for i, query in enumerate(itertools.cycle(queries)):
+            scheduled = origin + i * interval
+            if scheduled - origin >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(_call, target, query, scheduled, origin))
+    return [future.result() for future in futures]
+
+
+def summarize_level(samples: list[tuple], duration: float) -> dict:
+    """Throughput, error rate, latency percentiles (successful requests) and a per-second timeline."""
+    ok = [latency for _, latency, error in samples if error is None]
+    errors = Counter(error for _, _, error in samples if error is not None)
+    elapsed = max([duration] + [start + latency for start, latency, _ in samples])
+
+    timeline = []
+    for second in range(int(np.ceil(elapsed))):
+        bucket = [(latency, error) for start, latency, error in samples if second <= start < second + 1]
+        latencies = [latency for latency, error in bucket if error is None]
+        timeline.append({
+            "second": second,
+            "started": len(bucket),
+            "errors": sum(1 for _, error in bucket if error is not None),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000) if latencies else None,
+        })
+
+    return {
+        "requests": len(samples),
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": sum(errors.values()) / len(samples) if samples else 0.0,
+        "errors": dict(errors),
+        "latency": summarize(ok),
+        "timeline": timeline,
+    }
+
+
+def find_knee(levels: list[dict], latency_factor: float = 2.0, min_gain: float = 0.05) -> dict | None:
+    """
+    First level where the system stops scaling: p95 latency above `latency_factor` x the
+    lightest level's, throughput up by less than `min_gain` over the best level so far,
+    errors appearing, or (open loop) achieved throughput below 95% of the offered rate.
+    """
+    baseline = levels[0]["latency"].get("p95_ms") if levels else None
+    best_throughput = 0.0
+    for level in levels:
+        p95 = level["latency"].get("p95_ms")
+        reason = None
+        if level["error_rate"] > 0.01:
+            reason = f"error rate {level['error_rate']:.1%}"
+        elif baseline and p95 and p95 > latency_factor * baseline:
+            reason = f"p95 {p95:.0f}ms > {latency_factor:g}x baseline {baseline:.0f}ms"
+        elif level["mode"] == "qps" and level["throughput"] < 0.95 * level["load"]:
+            reason = f"throughput {level['throughput']:.1f}/s below offered {level['load']:g}/s"
+        elif best_throughput and level["throughput"] < best_throughput * (1 + min_gain):
+            reason = f"throughput flat ({level['throughput']:.1f}/s vs {best_throughput:.1f}/s)"
+        if reason:
+            return {"mode": level["mode"], "load": level["load"], "reason": reason}
+        best_throughput = max(best_throughput, level["throughput"])
+    return None
+
+
+def run_load_test(target_name: str, queries: list[str], levels: list[float], mode: str = "concurrency",
+                  duration: float = 30.0, k: int = 5, url: str = DEFAULT_URL, max_workers: int = 64,
+                  use_cache: bool = False) -> dict:
+    """
+    Run every load level in turn (after one warm-up request) and detect the knee.
+    In-process targets run with caches off unless `use_cache`.
+    """
+    if not target_name.startswith("http") and not use_cache:
+        disable_caches()
+    target = make_target(target_name, k=k, url=url)
+    target(queries[0])
+
+    results = []
+    for load in levels:
+        print(f"  {mode}={load:g} for {duration:g}s...", flush=True)
+        if mode == "concurrency":
+            samples = run_closed_loop(target, queries, int(load), duration)
+        else:
+            samples = run_open_loop(target, queries, load, duration, max_workers)
+        results.append({"mode": mode, "load": load, **summarize_level(samples, duration)})
+
+    return {
+        "target": target_name,
+        "url": url if target_name.startswith("http") else None,
+        "queries": len(queries),
+        "duration_seconds": duration,
+        "cache": cache_state(target_name, url),
+        "levels": results,
+        "knee": find_knee(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for hybrid_search / generate_answer")
+    parser.add_argument("--target", choices=TARGETS, default="hybrid")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, nargs="+", help="Closed-loop user counts, e.g. 1 2 4 8 16")
+    load.add_argument("--qps", type=float, nargs="+", help="Open-loop request rates, e.g. 1 2 5 10")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per load level")
+    parser.add_argument("--queries", help="Query file, one query per line (default: EVAL_QUESTIONS)")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--url", default=DEFAULT_URL, help="server.py base URL for http-* targets")
+    parser.add_argument("--max-workers", type=int, default=64, help="Open-loop request threads")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep the in-process query/result caches on (measures cache hits, not the system)")
+    parser.add_argument("--output", help="Write the full report (with timelines) as JSON to this path")
+    args = parser.parse_args()
+
+    mode, levels = ("qps", args.qps) if args.qps else ("concurrency", args.concurrency or [1, 2, 4, 8, 16])
+
+    print("=" * 50)
+    print(f"LOAD TEST: {args.target}")
+    print("=" * 50)
+
+    report = run_load_test(args.target, load_queries(args.queries), levels, mode=mode, duration=args.duration,
+                           k=args.k, url=args.url, max_workers=args.max_workers, use_cache=args.cache)
+
+    cache = report["cache"]
+    if cache["result_cache_size"] is None:
+        print("\nCache state unknown (target did not report it)")
+    elif cache["result_cache_size"] or cache["query_cache_size"]:
+        print(f"\nWARNING: caches on (result {cache['result_cache_size']}, query vectors {cache['query_cache_size']}); "
+              f"repeated queries are served from memory")
+    else:
+        print("\nCaches off: every request does the full work")
+
+    print(f"\n  {mode:>11} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for level in report["levels"]:
+        stats = level["latency"]
+        if stats["count"]:
+            latency = f"{stats['p50_ms']:7.0f}ms {stats['p95_ms']:7.0f}ms {stats['p99_ms']:7.0f}ms"
+        else:
+            latency = f"{'-':>9} {'-':>9} {'-':>9}"
+        print(f"  {level['load']:11g} {level['throughput']:8.1f} {latency} {level['error_rate']:7.1%}")
+
+    knee = report["knee"]
+    if knee:
+        print(f"\nKnee at {knee['mode']}={knee['load']:g}: {knee['reason']}")
+    else:
+        print("\nNo knee found; try higher load levels")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
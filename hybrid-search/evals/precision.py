@@ -3,14 +3,20 @@ Precision Eval - Measures retrieval quality using LLM-as-judge.
 Precision = relevant_docs / retrieved_docs
 """
 
+import hashlib
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dotenv import load_dotenv
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
-from retrieval import hybrid_search, vector_search, bm25_search, HYBRID_WEIGHTS
+from cache import DiskCache
+from embeddings import get_embedding_cache
+from retrieval import OLLAMA_KEEP_ALIVE, RetrievalSession, HYBRID_WEIGHTS
 from questions import EVAL_QUESTIONS
 
 load_dotenv()
@@ -18,6 +24,14 @@ load_dotenv()
 OLLAMA_BASE_URL = os.environ["OLLAMA_BASE_URL"]
 OLLAMA_LLM_MODEL = os.environ["OLLAMA_LLM_MODEL"]
 
+# Judge calls in flight at once (Ollama serves up to OLLAMA_NUM_PARALLEL of them concurrently)
+JUDGE_CONCURRENCY = int(os.getenv("JUDGE_CONCURRENCY", "4"))
+
+# Persistent judge verdicts, so each (question, chunk) pair is judged once across methods and runs
+# (set JUDGE_CACHE_PATH to an empty string to disable)
+JUDGE_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "judge_verdicts.sqlite"))
+JUDGE_CACHE_MAX_ENTRIES = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", "500000"))
+
 RELEVANCE_PROMPT = """Does this document help answer the question?
 
 Question: {question}
@@ -30,13 +44,27 @@ Reply with "no" if the document is unrelated or only tangentially related.
 
 Answer (yes/no):"""
 
+# Verdicts are only reused while the judge prompt is unchanged
+PROMPT_HASH = hashlib.sha256(RELEVANCE_PROMPT.encode("utf-8")).hexdigest()[:16]
+
+
+_judge_chain = None
+
+
+def get_judge_chain():
+    """Relevance prompt -> Ollama LLM, built once and reused for every judgement."""
+    global _judge_chain
+    if _judge_chain is None:
+        llm = ChatOllama(
+            model=OLLAMA_LLM_MODEL, temperature=0, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        _judge_chain = ChatPromptTemplate.from_template(RELEVANCE_PROMPT) | llm
+    return _judge_chain
+
 
 def judge_relevance(question: str, document) -> bool:
     """Use LLM to judge if a document is relevant to the question."""
-    llm = ChatOllama(model=OLLAMA_LLM_MODEL, temperature=0, base_url=OLLAMA_BASE_URL)
-    prompt = ChatPromptTemplate.from_template(RELEVANCE_PROMPT)
-
-    result = (prompt | llm).invoke({
+    result = get_judge_chain().invoke({
         "question": question,
         "title": document.metadata.get("title", "Unknown"),
         "content": document.page_content[:1000]
@@ -50,13 +78,84 @@ def judge_relevance(question: str, document) -> bool:
     return is_relevant
 
 
+_judge_cache = None
+
+
+def get_judge_cache() -> DiskCache | None:
+    """Return the on-disk verdict cache, or None if JUDGE_CACHE_PATH is empty."""
+    global _judge_cache
+    if _judge_cache is None and JUDGE_CACHE_PATH:
+        _judge_cache = DiskCache(JUDGE_CACHE_PATH, max_entries=JUDGE_CACHE_MAX_ENTRIES)
+    return _judge_cache
+
+
+def chunk_hash(document) -> str:
+    """Hash of the chunk text (the same chunk hashes the same whichever method retrieved it)."""
+    return hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+
+
+def verdict_key(question: str, document) -> str:
+    """Cache key: judge model, prompt hash, question and chunk content."""
+    question_hash = hashlib.sha256(question.encode("utf-8")).hexdigest()
+    return f"{OLLAMA_LLM_MODEL}|{PROMPT_HASH}|{question_hash}|{chunk_hash(document)}"
+
+
+def verdict_record(question: str, document, relevant: bool) -> dict:
+    """Cached verdict, with enough context to rebuild relevance judgements from it later."""
+    return {
+        "question": question,
+        "source_file": document.metadata.get("source_file"),
+        "chunk_index": document.metadata.get("chunk_index"),
+        "title": document.metadata.get("title"),
+        "content_hash": chunk_hash(document),
+        "relevant": relevant,
+        "model": OLLAMA_LLM_MODEL,
+        "prompt_hash": PROMPT_HASH,
+    }
+
+
+def _judge_pairs(pairs: list[tuple[str, object]], max_concurrency: int) -> list[bool]:
+    """Call the judge for every pair, at most `max_concurrency` at a time, keeping input order."""
+    if max_concurrency <= 1 or len(pairs) <= 1:
+        return [judge_relevance(question, doc) for question, doc in pairs]
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="judge") as pool:
+        return list(pool.map(lambda pair: judge_relevance(*pair), pairs))
+
+
+def judge_many(pairs: list[tuple[str, object]], max_concurrency: int = JUDGE_CONCURRENCY) -> list[bool]:
+    """
+    judge_relevance over (question, document) pairs with at most `max_concurrency`
+    calls in flight. Verdicts keep input order, so totals match a serial run.
+    Each distinct pair is judged once; verdicts are read from and written to the judge cache.
+    """
+    keys = [verdict_key(question, doc) for question, doc in pairs]
+    unique = dict(zip(keys, pairs))
+
+    cache = get_judge_cache()
+    cached = cache.get_many(list(unique)) if cache is not None else {}
+    verdicts = {key: json.loads(value)["relevant"] for key, value in cached.items()}
+
+    missing = [key for key in unique if key not in verdicts]
+    fresh = _judge_pairs([unique[key] for key in missing], max_concurrency)
+    verdicts.update(zip(missing, fresh))
+
+    if cache is not None and missing:
+        cache.set_many({
+            key: json.dumps(verdict_record(*unique[key], relevant)).encode("utf-8")
+            for key, relevant in zip(missing, fresh)
+        })
+
+    return [verdicts[key] for key in keys]
+
+
+def precision_from_verdicts(verdicts: list[bool]) -> float:
+    """Precision = relevant_docs / total_docs."""
+    return sum(verdicts) / len(verdicts) if verdicts else 0.0
+
+
 def calculate_precision(question: str, documents: list) -> float:
     """Calculate precision = relevant_docs / total_docs."""
-    if not documents:
-        return 0.0
-
-    relevant = sum(1 for doc in documents if judge_relevance(question, doc))
-    return relevant / len(documents)
+    return precision_from_verdicts(judge_many([(question, doc) for doc in documents]))
 
 
 def run_evaluation(test_questions: list[str], k: int = 5):
@@ -66,19 +165,33 @@ def run_evaluation(test_questions: list[str], k: int = 5):
     print("=" * 50)
 
     totals = {"hybrid": [], "vector": [], "bm25": []}
-
-    for question in test_questions:
+    session = RetrievalSession()
+
+    # Retrieve for all questions up front with the batch APIs
+    results = {
+        "hybrid": session.hybrid_search_many(test_questions, k),
+        "vector": session.vector_search_many(test_questions, k),
+        "bm25": session.bm25_search_many(test_questions, k),
+    }
+
+    # Judge every retrieved document through one bounded pool, then regroup in order
+    pairs = [
+        (question, doc)
+        for i, question in enumerate(test_questions)
+        for method in totals
+        for doc in results[method][i]
+    ]
+    print(f"Judging {len(pairs)} retrieved documents ({JUDGE_CONCURRENCY} at a time, cached verdicts reused)...")
+    verdicts = iter(judge_many(pairs))
+
+    for i, question in enumerate(test_questions):
         print(f"\nQuery: {question}")
 
-        hybrid_p = calculate_precision(question, hybrid_search(question, k))
-        vector_p = calculate_precision(question, vector_search(question, k))
-        bm25_p = calculate_precision(question, bm25_search(question, k))
+        for method in totals:
+            totals[method].append(precision_from_verdicts([next(verdicts) for _ in results[method][i]]))
 
-        totals["hybrid"].append(hybrid_p)
-        totals["vector"].append(vector_p)
-        totals["bm25"].append(bm25_p)
-
-        print(f"  Hybrid: {hybrid_p:.0%} | Vector: {vector_p:.0%} | BM25: {bm25_p:.0%}")
+        print(f"  Hybrid: {totals['hybrid'][-1]:.0%} | Vector: {totals['vector'][-1]:.0%} | "
+              f"BM25: {totals['bm25'][-1]:.0%}")
 
     # Averages
     print("\n" + "=" * 50)
@@ -97,6 +210,13 @@ def run_evaluation(test_questions: list[str], k: int = 5):
     print(f"Hybrid vs Vector: {hybrid_vs_vector:+.0%}")
     print(f"Hybrid vs BM25:   {hybrid_vs_bm25:+.0%}")
 
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"\nEmbedding cache: {cache.stats()}")
+    judge_cache = get_judge_cache()
+    if judge_cache is not None:
+        print(f"Judge cache: {judge_cache.stats()}")
+
 
 def main():
     run_evaluation(EVAL_QUESTIONS)
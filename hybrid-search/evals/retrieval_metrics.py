@@ -0,0 +1,160 @@
+"""
+Offline Retrieval Metrics - recall@k, MRR and nDCG@k against a relevance-judgement file (qrels).
+No LLM calls: relevance comes from the qrels file, so a full run takes seconds.
+
+Qrels format (JSON), relevant chunks per question as "<source_file>#<chunk_index>":
+
+    {
+      "meta": {"model": "llama3.2", "prompt_hash": "..."},
+      "queries": {
+        "How do I set up webhooks?": ["webhooks.md#0", "webhooks.md#1"]
+      }
+    }
+
+Seed or refresh it from the judge verdicts cached by evals/precision.py with --seed.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from evals.precision import OLLAMA_LLM_MODEL, PROMPT_HASH, get_judge_cache
+from retrieval import RetrievalSession
+
+load_dotenv()
+
+QRELS_PATH = Path(os.getenv("QRELS_PATH", Path(__file__).parent / "qrels.json"))
+
+METHODS = ["hybrid", "vector", "bm25"]
+
+
+def doc_id(document) -> str:
+    """Stable chunk id used in qrels: "<source_file>#<chunk_index>"."""
+    return f"{document.metadata.get('source_file')}#{document.metadata.get('chunk_index')}"
+
+
+def seed_qrels_from_verdicts(model: str = OLLAMA_LLM_MODEL, prompt_hash: str = PROMPT_HASH) -> dict:
+    """
+    Build qrels from cached judge verdicts for this judge model and prompt.
+    A chunk counts as relevant if any cached verdict for it says so.
+    """
+    cache = get_judge_cache()
+    if cache is None:
+        raise ValueError("Judge cache is disabled (JUDGE_CACHE_PATH is empty); nothing to seed from")
+
+    queries = {}
+    for _, value in cache.items():
+        record = json.loads(value)
+        if record["model"] != model or record["prompt_hash"] != prompt_hash:
+            continue
+        relevant = queries.setdefault(record["question"], set())
+        if record["relevant"] and record.get("chunk_index") is not None:
+            relevant.add(f"{record['source_file']}#{record['chunk_index']}")
+
+    return {
+        "meta": {"model": model, "prompt_hash": prompt_hash},
+        "queries": {question: sorted(ids) for question, ids in sorted(queries.items())},
+    }
+
+
+def load_qrels(path: Path = QRELS_PATH) -> dict[str, set[str]]:
+    """Return {question: set of relevant chunk ids}."""
+    with open(path) as f:
+        return {question: set(ids) for question, ids in json.load(f)["queries"].items()}
+
+
+def save_qrels(qrels: dict, path: Path = QRELS_PATH):
+    """Write a qrels dict (as returned by seed_qrels_from_verdicts)."""
+    with open(path, "w") as f:
+        json.dump(qrels, f, indent=2)
+        f.write("\n")
+
+
+def _unique(ids: list[str]) -> list[str]:
+    """Drop repeated chunk ids, keeping first-seen order (a chunk only counts once)."""
+    return list(dict.fromkeys(ids))
+
+
+def recall_at_k(retrieved: list[str], relevant: set[str], k: int) -> float:
+    """Fraction of the relevant chunks that appear in the top k."""
+    return len(set(_unique(retrieved)[:k]) & relevant) / len(relevant)
+
+
+def reciprocal_rank(retrieved: list[str], relevant: set[str]) -> float:
+    """1 / rank of the first relevant chunk (0 if none was retrieved)."""
+    for rank, chunk_id in enumerate(_unique(retrieved), start=1):
+        if chunk_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(retrieved: list[str], relevant: set[str], k: int) -> float:
+    """Binary-relevance nDCG@k."""
+    dcg = sum(
+        1.0 / math.log2(rank + 1)
+        for rank, chunk_id in enumerate(_unique(retrieved)[:k], start=1) if chunk_id in relevant
+    )
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal
+
+
+def evaluate(qrels: dict[str, set[str]], k: int = 5, session: RetrievalSession = None) -> dict[str, dict]:
+    """
+    Mean recall@k, MRR and nDCG@k per retrieval method.
+    Questions without any relevant chunk are skipped (recall is undefined for them).
+    """
+    questions = [question for question, relevant in qrels.items() if relevant]
+    session = session or RetrievalSession()
+    results = {
+        "hybrid": session.hybrid_search_many(questions, k),
+        "vector": session.vector_search_many(questions, k),
+        "bm25": session.bm25_search_many(questions, k),
+    }
+
+    report = {}
+    for method in METHODS:
+        scores = {"recall": [], "mrr": [], "ndcg": []}
+        for question, documents in zip(questions, results[method]):
+            retrieved = [doc_id(doc) for doc in documents]
+            relevant = qrels[question]
+            scores["recall"].append(recall_at_k(retrieved, relevant, k))
+            scores["mrr"].append(reciprocal_rank(retrieved, relevant))
+            scores["ndcg"].append(ndcg_at_k(retrieved, relevant, k))
+        report[method] = {
+            name: sum(values) / len(values) if values else 0.0 for name, values in scores.items()
+        }
+    report["questions"] = len(questions)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval metrics from a qrels file")
+    parser.add_argument("--seed", action="store_true", help="(Re)build the qrels file from cached judge verdicts")
+    parser.add_argument("--qrels", type=Path, default=QRELS_PATH, help="Qrels file")
+    parser.add_argument("-k", type=int, default=5, help="Cutoff for recall@k and nDCG@k")
+    args = parser.parse_args()
+
+    if args.seed:
+        qrels = seed_qrels_from_verdicts()
+        save_qrels(qrels, args.qrels)
+        print(f"Seeded {len(qrels['queries'])} questions into {args.qrels}")
+
+    print("=" * 50)
+    print("RETRIEVAL METRICS (qrels)")
+    print("=" * 50)
+
+    report = evaluate(load_qrels(args.qrels), k=args.k)
+    print(f"{report['questions']} questions with relevant chunks, k={args.k}\n")
+    print(f"  {'Method':8} {'Recall@k':>9} {'MRR':>7} {'nDCG@k':>8}")
+    for method in METHODS:
+        scores = report[method]
+        print(f"  {method.capitalize():8} {scores['recall']:9.3f} {scores['mrr']:7.3f} {scores['ndcg']:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Fusion Tuner - grid search over HYBRID_WEIGHTS and RRF_K without re-running retrieval.
+
+BM25 and vector candidate lists are retrieved once per eval question and cached on disk
+(until the collection changes). Every (weights, RRF k) setting is then fused at once with
+NumPy and scored against cached judge verdicts (precision@k and nDCG@k), so a sweep
+takes seconds. Candidates never judged before are judged once and cached.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from evals.precision import get_judge_cache, judge_many, verdict_key
+from retrieval import HYBRID_WEIGHTS, RRF_K, RetrievalSession
+from questions import EVAL_QUESTIONS
+
+load_dotenv()
+
+FUSION_CANDIDATES_PATH = Path(os.getenv(
+    "FUSION_CANDIDATES_PATH", Path(__file__).parent.parent / ".cache" / "fusion_candidates.json"
+))
+
+DEFAULT_RRF_KS = [1, 5, 10, 20, 30, 40, 60, 80, 100, 150, 200]
+
+
+def _fingerprint_key(fingerprint: tuple) -> list[str]:
+    """JSON-friendly collection fingerprint (it contains an ObjectId)."""
+    return [str(value) for value in fingerprint]
+
+
+def load_candidates(questions: list[str], candidate_k: int, session: RetrievalSession,
+                    path: Path = FUSION_CANDIDATES_PATH) -> dict[str, dict[str, list[Document]]]:
+    """
+    {question: {"bm25": [...], "vector": [...]}} with `candidate_k` candidates per method.
+    Read from the cache file when it matches the collection fingerprint; missing questions are retrieved.
+    """
+    fingerprint = _fingerprint_key(session.fingerprint)
+    stored = {}
+    if path.exists():
+        data = json.loads(path.read_text())
+        if data["fingerprint"] == fingerprint and data["candidate_k"] == candidate_k:
+            stored = data["questions"]
+
+    todo = [question for question in questions if question not in stored]
+    if todo:
+        print(f"Retrieving candidates for {len(todo)} questions...")
+        bm25_lists = session.bm25_search_many(todo, candidate_k)
+        vector_lists = session.vector_search_many(todo, candidate_k)
+        for question, bm25_results, vector_results in zip(todo, bm25_lists, vector_lists):
+            stored[question] = {
+                method: [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                for method, docs in (("bm25", bm25_results), ("vector", vector_results))
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"fingerprint": fingerprint, "candidate_k": candidate_k, "questions": stored}))
+
+    return {
+        question: {method: [Document(**doc) for doc in stored[question][method]] for method in ("bm25", "vector")}
+        for question in questions
+    }
+
+
+def build_rank_matrices(questions: list[str], candidates: dict) -> tuple[np.ndarray, np.ndarray, list]:
+    """
+    Per question, the union of BM25 and vector candidates, in the order reciprocal_rank_fusion
+    first sees them (so stable sorting breaks ties the same way).
+    Returns 1-based ranks (bm25, vector) of shape (questions, max candidates) with inf where a
+    candidate is missing from a list, plus the candidate documents per question.
+    """
+    unions = []
+    for question in questions:
+        union = {}
+        for doc in candidates[question]["bm25"] + candidates[question]["vector"]:
+            union.setdefault(doc.page_content, doc)
+        unions.append(list(union.values()))
+
+    width = max((len(union) for union in unions), default=0)
+    ranks = np.full((2, len(questions), width), np.inf)
+    for q, question in enumerate(questions):
+        position = {doc.page_content: i for i, doc in enumerate(unions[q])}
+        for leg, method in enumerate(("bm25", "vector")):
+            for rank, doc in enumerate(candidates[question][method], start=1):
+                column = position[doc.page_content]
+                # A repeated chunk accumulates score in RRF; keep its best rank (lists are deduplicated in practice)
+                ranks[leg, q, column] = min(ranks[leg, q, column], rank)
+    return ranks[0], ranks[1], unions
+
+
+def fuse_grid(bm25_ranks: np.ndarray, vector_ranks: np.ndarray, weights: np.ndarray,
+              rrf_ks: np.ndarray, k: int) -> np.ndarray:
+    """
+    RRF for every ([BM25, vector] weight pair, RRF k) setting at once.
+    Scores use reciprocal_rank_fusion's exact expression and summation order, so
+    near-ties sort the same as in production.
+    Returns top-k candidate columns of shape (weights, rrf_ks, questions, k), -1 where fewer exist.
+    """
+    bm25_weight = weights[:, 0, None, None, None]
+    vector_weight = weights[:, 1, None, None, None]
+    c = rrf_ks[None, :, None, None]
+    # weight * (1.0 / (k + rank)); a missing leg contributes exactly 0.0, like a doc absent from that list
+    scores = bm25_weight * (1.0 / (c + bm25_ranks)) + vector_weight * (1.0 / (c + vector_ranks))
+    present = np.isfinite(bm25_ranks) | np.isfinite(vector_ranks)
+    scores = np.where(present, scores, -np.inf)
+
+    order = np.argsort(-scores, axis=-1, kind="stable")[..., :k]
+    valid = np.take_along_axis(np.broadcast_to(present, scores.shape), order, axis=-1)
+    return np.where(valid, order, -1)
+
+
+def score_grid(top: np.ndarray, relevance: np.ndarray, k: int) -> dict[str, np.ndarray]:
+    """Mean precision@k and binary nDCG@k over questions, shape (weights, rrf_ks)."""
+    hits = np.where(top >= 0, np.take_along_axis(
+        np.broadcast_to(relevance, top.shape[:-1] + relevance.shape[-1:]), np.maximum(top, 0), axis=-1
+    ), False)
+    retrieved = (top >= 0).sum(axis=-1)
+    precision = np.divide(hits.sum(axis=-1), retrieved, out=np.zeros(retrieved.shape), where=retrieved > 0)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits * discounts[:top.shape[-1]]).sum(axis=-1)
+    ideal_hits = np.minimum(relevance.sum(axis=-1), k)
+    idcg = np.array([discounts[:n].sum() for n in ideal_hits])
+    ndcg = np.divide(dcg, idcg, out=np.zeros(dcg.shape), where=idcg > 0)
+
+    return {"precision": precision.mean(axis=-1), "ndcg": ndcg.mean(axis=-1)}
+
+
+def relevance_matrix(questions: list[str], unions: list, width: int, judge_missing: bool = True) -> np.ndarray:
+    """Judge verdict per candidate (False for padding and, with judge_missing=False, unjudged ones)."""
+    pairs = [(question, doc) for question, union in zip(questions, unions) for doc in union]
+    if judge_missing:
+        verdicts = judge_many(pairs)
+    else:
+        keys = [verdict_key(*pair) for pair in pairs]
+        cache = get_judge_cache()
+        cached = cache.get_many(keys) if cache is not None else {}
+        verdicts = [json.loads(cached[key])["relevant"] if key in cached else False for key in keys]
+        print(f"Cached verdicts for {len(cached)}/{len(pairs)} candidates (others count as not relevant)")
+
+    relevance = np.zeros((len(questions), width), dtype=bool)
+    it = iter(verdicts)
+    for q, union in enumerate(unions):
+        for i in range(len(union)):
+            relevance[q, i] = next(it)
+    return relevance
+
+
+def tune(questions: list[str], k: int = 5, bm25_weights: list[float] = None, rrf_ks: list[int] = None,
+         judge_missing: bool = True, session: RetrievalSession = None) -> list[dict]:
+    """Score every setting; returns one dict per setting, best first."""
+    if bm25_weights is None:
+        bm25_weights = [i / 10 for i in range(11)]
+    rrf_ks = rrf_ks or DEFAULT_RRF_KS
+    session = session or RetrievalSession()
+
+    # Same candidate depth hybrid_search uses
+    candidates = load_candidates(questions, k * 3, session)
+    bm25_ranks, vector_ranks, unions = build_rank_matrices(questions, candidates)
+    relevance = relevance_matrix(questions, unions, bm25_ranks.shape[1], judge_missing)
+
+    # The reported weights are the exact floats fused with, so copying them into HYBRID_WEIGHTS reproduces the ranking
+    weights = [[float(w), round(1.0 - w, 4)] for w in bm25_weights]
+
+    start = time.perf_counter()
+    top = fuse_grid(bm25_ranks, vector_ranks, np.asarray(weights, dtype=float), np.asarray(rrf_ks, dtype=float), k)
+    scores = score_grid(top, relevance, k)
+    print(f"Fused and scored {len(bm25_weights) * len(rrf_ks)} settings in {time.perf_counter() - start:.3f}s")
+
+    results = [
+        {
+            "weights": weights[i],
+            "rrf_k": rrf_ks[j],
+            "precision": float(scores["precision"][i, j]),
+            "ndcg": float(scores["ndcg"][i, j]),
+        }
+        for i in range(len(bm25_weights)) for j in range(len(rrf_ks))
+    ]
+    return sorted(results, key=lambda r: (r["precision"], r["ndcg"]), reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search hybrid weights and RRF k over cached rankings")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--rrf-k", type=int, nargs="+", default=DEFAULT_RRF_KS, help="RRF k values to try")
+    parser.add_argument("--weight-step", type=float, default=0.1, help="BM25 weight grid step (vector = 1 - BM25)")
+    parser.add_argument("--top", type=int, default=10, help="Settings to print")
+    parser.add_argument("--cached-only", action="store_true",
+                        help="Do not call the judge; unjudged candidates count as not relevant")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("FUSION TUNING")
+    print("=" * 50)
+
+    steps = int(round(1.0 / args.weight_step))
+    bm25_weights = [round(i / steps, 4) for i in range(steps + 1)]
+    results = tune(EVAL_QUESTIONS, k=args.k, bm25_weights=bm25_weights, rrf_ks=args.rrf_k,
+                   judge_missing=not args.cached_only)
+
+    print(f"\n  {'BM25/Vector':12} {'RRF k':>6} {'P@k':>7} {'nDCG@k':>8}")
+    for r in results[:args.top]:
+        print(f"  {r['weights'][0]:.2f}/{r['weights'][1]:.2f}    {r['rrf_k']:6} {r['precision']:7.1%} {r['ndcg']:8.3f}")
+
+    # Current configuration for reference (weights normalised; RRF ranks are scale-invariant)
+    total = sum(HYBRID_WEIGHTS)
+    current_weight = round(HYBRID_WEIGHTS[0] / total, 4)
+    current = next(
+        (r for r in results if abs(r["weights"][0] - current_weight) < 1e-9 and r["rrf_k"] == RRF_K), None
+    )
+    if current is not None:
+        print(f"\nCurrent (weights={HYBRID_WEIGHTS}, RRF_K={RRF_K}): "
+              f"P@k {current['precision']:.1%}, nDCG@k {current['ndcg']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
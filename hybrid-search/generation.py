@@ -3,14 +3,18 @@ Generation - Use retrieved context to generate answers with local Ollama LLM.
 LangFuse provides observability (traces all LangChain operations).
 """
 
+import atexit
 import os
+import time
 from dotenv import load_dotenv
 
 from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
-from retrieval import hybrid_search, format_retrieved_context
+from retrieval import (
+    OLLAMA_KEEP_ALIVE, RetrievalSession, ahybrid_search, get_default_session, format_retrieved_context,
+)
 
 load_dotenv()
 
@@ -19,10 +23,34 @@ OLLAMA_BASE_URL = os.environ["OLLAMA_BASE_URL"]
 OLLAMA_LLM_MODEL = os.environ["OLLAMA_LLM_MODEL"]
 LANGFUSE_HOST = os.environ["LANGFUSE_HOST"]
 
+# Tracing export settings: spans are queued and exported by a background thread.
+# Fraction of requests traced (lower it for high-traffic deployments)
+LANGFUSE_SAMPLE_RATE = float(os.getenv("LANGFUSE_SAMPLE_RATE", "1.0"))
+# Spans buffered while LangFuse is slow or down; beyond this new spans are dropped
+LANGFUSE_MAX_QUEUE_SIZE = int(os.getenv("LANGFUSE_MAX_QUEUE_SIZE", "2048"))
+LANGFUSE_FLUSH_INTERVAL = float(os.getenv("LANGFUSE_FLUSH_INTERVAL", "5"))
+LANGFUSE_TIMEOUT = int(os.getenv("LANGFUSE_TIMEOUT", "5"))
+
+# The OpenTelemetry batch processor under LangFuse reads its queue bound from the environment
+os.environ.setdefault("OTEL_BSP_MAX_QUEUE_SIZE", str(LANGFUSE_MAX_QUEUE_SIZE))
+
 # LangFuse for observability (auto-traces LangChain operations)
 from langfuse import Langfuse, get_client
 from langfuse.langchain import CallbackHandler
-Langfuse(host=LANGFUSE_HOST)
+Langfuse(
+    host=LANGFUSE_HOST,
+    sample_rate=LANGFUSE_SAMPLE_RATE,
+    flush_interval=LANGFUSE_FLUSH_INTERVAL,
+    timeout=LANGFUSE_TIMEOUT,
+)
+
+
+def flush_traces():
+    """Export any queued traces; runs once at interpreter exit, never per request."""
+    get_client().flush()
+
+
+atexit.register(flush_traces)
 
 RAG_PROMPT = """You are a technical support analyst. Answer using ONLY the context below.
 If the context doesn't have the answer, say so.
@@ -35,15 +63,56 @@ Question: {question}
 Answer:"""
 
 
-def generate_answer(question: str, k: int = 5) -> dict:
+# Concurrent LLM calls when answering many questions at once
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "4"))
+
+
+def build_chain():
+    """Prompt -> Ollama LLM -> plain string."""
+    prompt = ChatPromptTemplate.from_template(RAG_PROMPT)
+    llm = ChatOllama(
+        model=OLLAMA_LLM_MODEL, temperature=0, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE
+    )
+    return prompt | llm | StrOutputParser()
+
+
+_chain = None
+
+
+def get_chain():
+    """
+    Process-wide RAG chain, built on first use (runnables are safe to share across threads).
+    Reusing the ChatOllama instance also reuses its HTTP client, so connections stay open.
+    """
+    global _chain
+    if _chain is None:
+        _chain = build_chain()
+    return _chain
+
+
+def build_result(answer: str, documents: list) -> dict:
+    """Answer + sources for transparency (+ raw documents for evals)."""
+    return {
+        "answer": answer,
+        "sources": [
+            {"title": doc.metadata.get("title", "Unknown"), "route": doc.metadata.get("route", "N/A")}
+            for doc in documents
+        ],
+        "documents": documents  # For evals
+    }
+
+
+def generate_answer(question: str, k: int = 5, session: RetrievalSession = None) -> dict:
     """
     RAG pipeline: Retrieve -> Format Context -> Generate Answer.
     Returns answer + sources for transparency.
+    The session keeps the corpus warm across questions (defaults to the process-wide one).
     """
     langfuse_handler = CallbackHandler()
+    session = session or get_default_session()
 
     # 1. Retrieve
-    documents = hybrid_search(question, k=k)
+    documents = session.hybrid_search(question, k=k)
     if not documents:
         return {"answer": "No relevant documents found.", "sources": []}
 
@@ -51,25 +120,93 @@ def generate_answer(question: str, k: int = 5) -> dict:
     context = format_retrieved_context(documents)
 
     # 3. Generate
-    prompt = ChatPromptTemplate.from_template(RAG_PROMPT)
-    llm = ChatOllama(model=OLLAMA_LLM_MODEL, temperature=0, base_url=OLLAMA_BASE_URL)
-    chain = prompt | llm | StrOutputParser()
+    chain = get_chain()
 
     answer = chain.invoke(
         {"context": context, "question": question},
         config={"callbacks": [langfuse_handler]}
     )
 
-    get_client().flush()
+    return build_result(answer, documents)
 
-    return {
-        "answer": answer,
-        "sources": [
-            {"title": doc.metadata.get("title", "Unknown"), "route": doc.metadata.get("route", "N/A")}
-            for doc in documents
-        ],
-        "documents": documents  # For evals
-    }
+
+class AnswerStream:
+    """
+    Streaming generate_answer: iterate to receive answer tokens as Ollama produces them.
+    Once iteration finishes, `result` holds the build_result dict plus
+    `time_to_first_token` (seconds from the call to the first token, retrieval included).
+    """
+
+    def __init__(self, question: str, k: int = 5, session: RetrievalSession = None):
+        self.question = question
+        self.k = k
+        self.session = session or get_default_session()
+        self.result = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        documents = self.session.hybrid_search(self.question, k=self.k)
+        if not documents:
+            self.result = {"answer": "No relevant documents found.", "sources": [], "time_to_first_token": None}
+            yield self.result["answer"]
+            return
+
+        tokens = []
+        time_to_first_token = None
+        for token in get_chain().stream(
+            {"context": format_retrieved_context(documents), "question": self.question},
+            config={"callbacks": [CallbackHandler()]}
+        ):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+            tokens.append(token)
+            yield token
+
+        self.result = build_result("".join(tokens), documents)
+        self.result["time_to_first_token"] = time_to_first_token
+
+
+def stream_answer(question: str, k: int = 5, session: RetrievalSession = None) -> AnswerStream:
+    """Like generate_answer, but returns an AnswerStream that yields tokens live."""
+    return AnswerStream(question, k=k, session=session)
+
+
+async def agenerate_answer(question: str, k: int = 5, session: RetrievalSession = None) -> dict:
+    """Async generate_answer: retrieval and the Ollama call are awaited, not blocking the loop."""
+    langfuse_handler = CallbackHandler()
+
+    documents = await ahybrid_search(question, k=k, session=session)
+    if not documents:
+        return {"answer": "No relevant documents found.", "sources": []}
+
+    answer = await get_chain().ainvoke(
+        {"context": format_retrieved_context(documents), "question": question},
+        config={"callbacks": [langfuse_handler]}
+    )
+
+    return build_result(answer, documents)
+
+
+def generate_answers(
+    questions: list[str], k: int = 5, session: RetrievalSession = None, max_concurrency: int = GENERATION_CONCURRENCY
+) -> list[dict]:
+    """
+    Bulk answering: retrieve for all questions with hybrid_search_many, then
+    generate with at most `max_concurrency` LLM calls in flight. Results keep input order.
+    """
+    session = session or get_default_session()
+    all_documents = session.hybrid_search_many(questions, k=k)
+
+    todo = [i for i, documents in enumerate(all_documents) if documents]
+    answers = get_chain().batch(
+        [{"context": format_retrieved_context(all_documents[i]), "question": questions[i]} for i in todo],
+        config=[{"callbacks": [CallbackHandler()], "max_concurrency": max_concurrency} for _ in todo]
+    )
+
+    results = [{"answer": "No relevant documents found.", "sources": []} for _ in questions]
+    for i, answer in zip(todo, answers):
+        results[i] = build_result(answer, all_documents[i])
+    return results
 
 
 def interactive_mode():
@@ -78,6 +215,10 @@ def interactive_mode():
     print("RAG Q&A (type 'quit' to exit)")
     print("=" * 50)
 
+    # Load the corpus once up front; it stays warm across questions
+    session = RetrievalSession()
+    session.refresh()
+
     while True:
         question = input("\nQuestion: ").strip()
         if question.lower() in ['quit', 'exit', 'q']:
@@ -86,9 +227,16 @@ def interactive_mode():
             continue
 
         print("\nSearching...")
-        result = generate_answer(question)
+        stream = stream_answer(question, session=session)
+
+        print("\nAnswer: ", end="", flush=True)
+        for token in stream:
+            print(token, end="", flush=True)
+        print()
 
-        print(f"\nAnswer: {result['answer']}")
+        result = stream.result
+        if result["time_to_first_token"] is not None:
+            print(f"(first token after {result['time_to_first_token']:.2f}s)")
         print(f"\nSources:")
         for s in result["sources"]:
             print(f"  - {s['title']} ({s['route']})")
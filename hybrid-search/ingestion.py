@@ -2,28 +2,39 @@
 Ingestion Pipeline - Load docs, parse metadata, chunk, embed, store in MongoDB.
 """
 
+import argparse
+import hashlib
 import os
 import re
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
 
 from langchain_mongodb import MongoDBAtlasVectorSearch
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pymongo import MongoClient
+from pymongo import ReturnDocument
 
-from embeddings import NomicEmbeddings
+from embeddings import NomicEmbeddings, get_embedding_cache
+from mongo import get_mongo_client
 
 load_dotenv()
 
 # Configuration
-MONGO_DB_URL = os.environ["MONGO_DB_URL"]
 OLLAMA_BASE_URL = os.environ["OLLAMA_BASE_URL"]
 OLLAMA_MODEL = os.environ["OLLAMA_MODEL"]
 
 DB_NAME = "product_docs_rag"
 COLLECTION_NAME = "hybrid_search"
 INDEX_NAME = "vector_index"
+# Holds the ingest epoch per collection; bumped on every change so retrieval caches invalidate
+INGEST_META_COLLECTION = "ingest_meta"
+
+# Embedding stage: chunks per Ollama request, and max concurrent requests
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
 
 
 def parse_metadata_header(content: str) -> dict:
@@ -92,6 +103,11 @@ def extract_content_sections(content: str) -> str:
     return "\n".join(content_lines).strip()
 
 
+def content_hash(text: str) -> str:
+    """Stable hash used to detect changed files and chunks between ingests."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def load_document(md_path: Path) -> Document | None:
     """Load a single markdown document with parsed metadata."""
     try:
@@ -105,6 +121,7 @@ def load_document(md_path: Path) -> Document | None:
 
         metadata["source_file"] = md_path.name
         metadata["title"] = title
+        metadata["file_hash"] = content_hash(content)
 
         # Prepend title/routes so they're searchable (not just in metadata)
         searchable_text = f"{title}\n\n"
@@ -159,42 +176,154 @@ def chunk_documents(documents: list[Document], chunk_size: int = 2000, chunk_ove
             doc.metadata["total_chunks"] = 1
             chunked_docs.append(doc)
 
+    for chunk in chunked_docs:
+        chunk.metadata["content_hash"] = content_hash(chunk.page_content)
+
     print(f"Total chunks: {len(chunked_docs)}")
     return chunked_docs
 
 
-def get_mongo_client():
-    return MongoClient(MONGO_DB_URL)
-
-
-def setup_mongodb_collection():
-    """Set up MongoDB collection, clearing existing data."""
+def setup_mongodb_collection(clear: bool = False):
+    """Set up MongoDB collection, optionally clearing existing data (full rebuild)."""
     client = get_mongo_client()
     db = client[DB_NAME]
 
     if COLLECTION_NAME in db.list_collection_names():
-        print("Clearing existing collection...")
-        db[COLLECTION_NAME].delete_many({})
+        if clear:
+            print("Clearing existing collection...")
+            db[COLLECTION_NAME].delete_many({})
+            bump_ingest_epoch(db[COLLECTION_NAME])
     else:
         print("Creating new collection...")
         db.create_collection(COLLECTION_NAME)
 
-    return client, db[COLLECTION_NAME]
-
+    return db[COLLECTION_NAME]
 
-def create_vector_store(collection, documents: list[Document]):
-    """Generate embeddings with Ollama and store in MongoDB."""
-    embeddings = NomicEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL)
 
-    print(f"Creating embeddings for {len(documents)} chunks...")
-    vector_store = MongoDBAtlasVectorSearch.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        collection=collection,
-        index_name=INDEX_NAME
+def embed_chunks(
+    embeddings: NomicEmbeddings,
+    documents: list[Document],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT
+) -> list[list[float]]:
+    """
+    Embed chunks in batches, with at most `max_in_flight` Ollama requests at once.
+    Prints progress and throughput; returns vectors in the same order as documents.
+    """
+    texts = [doc.page_content for doc in documents]
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+
+    start = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(embeddings.embed_documents, batch): i for i, batch in enumerate(batches)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            done += len(batches[i])
+            elapsed = time.perf_counter() - start
+            print(f"  Embedded {done}/{len(texts)} chunks ({done / elapsed:.1f} chunks/sec)")
+
+    return [vector for batch in results for vector in batch]
+
+
+def bump_ingest_epoch(collection) -> int:
+    """Record that the collection changed. Returns the new epoch."""
+    meta = collection.database[INGEST_META_COLLECTION].find_one_and_update(
+        {"_id": collection.name},
+        {"$inc": {"epoch": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
+    return meta["epoch"]
+
+
+def create_vector_store(collection, documents: list[Document], reuse: dict = None):
+    """
+    Generate embeddings with Ollama and store in MongoDB.
+
+    Args:
+        reuse: Optional {content_hash: embedding} of vectors already stored; matching chunks skip Ollama
+    """
+    embeddings = NomicEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, cache=get_embedding_cache())
+    reuse = reuse or {}
+
+    to_embed = [doc for doc in documents if doc.metadata["content_hash"] not in reuse]
+    print(f"Creating embeddings for {len(to_embed)} chunks, reusing {len(documents) - len(to_embed)} "
+          f"(batch size {EMBED_BATCH_SIZE}, {EMBED_MAX_IN_FLIGHT} in flight)...")
+    vectors = dict(reuse)
+    for doc, vector in zip(to_embed, embed_chunks(embeddings, to_embed)):
+        vectors[doc.metadata["content_hash"]] = vector
+
+    # Same document layout MongoDBAtlasVectorSearch writes: text + embedding + flattened metadata
+    records = [
+        {"text": doc.page_content, "embedding": vectors[doc.metadata["content_hash"]], **doc.metadata}
+        for doc in documents
+    ]
+    for i in range(0, len(records), EMBED_BATCH_SIZE):
+        collection.insert_many(records[i:i + EMBED_BATCH_SIZE])
     print(f"Stored {len(documents)} documents")
-    return vector_store
+
+    return MongoDBAtlasVectorSearch(collection=collection, embedding=embeddings, index_name=INDEX_NAME)
+
+
+def sync_vector_store(collection, documents: list[Document]) -> dict:
+    """
+    Incremental ingest keyed on file and chunk content hashes.
+    - Files whose hash is unchanged and whose stored chunks are all present are
+      left untouched (no Ollama calls)
+    - Changed, new or partially stored files (e.g. after an interrupted run) have
+      their chunks replaced; chunks whose text is unchanged keep their stored embedding
+    - Chunks of files that no longer exist are removed
+    Run with --full after changing chunking settings (they are not part of the hash).
+    Returns counts of kept / inserted / deleted chunks.
+    """
+    expected = {}
+    for doc in documents:
+        expected.setdefault(doc.metadata["source_file"], []).append(doc.metadata["content_hash"])
+    current = {doc.metadata["source_file"]: doc.metadata["file_hash"] for doc in documents}
+    existing = list(collection.find(
+        {}, projection={"_id": 1, "source_file": 1, "file_hash": 1, "content_hash": 1}
+    ))
+
+    # A file is unchanged only if its stored chunks under the new hash are exactly the new chunk set
+    stored = {}
+    for doc in existing:
+        if current.get(doc.get("source_file")) == doc.get("file_hash"):
+            stored.setdefault(doc["source_file"], []).append(doc.get("content_hash"))
+    unchanged_files = {
+        source for source, hashes in stored.items() if sorted(hashes) == sorted(expected[source])
+    }
+
+    stale_ids = [doc["_id"] for doc in existing if doc.get("source_file") not in unchanged_files]
+    new_chunks = [doc for doc in documents if doc.metadata["source_file"] not in unchanged_files]
+
+    # Embeddings of replaced chunks whose text did not change
+    wanted = list({doc.metadata["content_hash"] for doc in new_chunks})
+    reuse = {}
+    for i in range(0, len(wanted), EMBED_BATCH_SIZE):
+        cursor = collection.find(
+            {"content_hash": {"$in": wanted[i:i + EMBED_BATCH_SIZE]}},
+            projection={"_id": 0, "content_hash": 1, "embedding": 1}
+        )
+        reuse.update({doc["content_hash"]: doc["embedding"] for doc in cursor})
+
+    # Insert before deleting so a changed file is never missing from the collection
+    if new_chunks:
+        create_vector_store(collection, new_chunks, reuse=reuse)
+    for i in range(0, len(stale_ids), EMBED_BATCH_SIZE):
+        collection.delete_many({"_id": {"$in": stale_ids[i:i + EMBED_BATCH_SIZE]}})
+    if new_chunks or stale_ids:
+        print(f"Ingest epoch: {bump_ingest_epoch(collection)}")
+
+    stats = {
+        "kept": len(existing) - len(stale_ids),
+        "inserted": len(new_chunks),
+        "deleted": len(stale_ids),
+    }
+    print(f"Kept {stats['kept']}, inserted {stats['inserted']}, deleted {stats['deleted']} chunks")
+    return stats
 
 
 def create_vector_search_index(collection):
@@ -222,6 +351,10 @@ def create_vector_search_index(collection):
 
 def main():
     """Run the ingestion pipeline."""
+    parser = argparse.ArgumentParser(description="Ingest product docs into MongoDB")
+    parser.add_argument("--full", action="store_true", help="Clear the collection and re-embed everything")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("INGESTION PIPELINE")
     print("=" * 50)
@@ -240,14 +373,15 @@ def main():
 
     # 3. Embed & Store
     print("\n3. Embedding and storing...")
-    client, collection = setup_mongodb_collection()
+    collection = setup_mongodb_collection(clear=args.full)
 
-    try:
-        create_vector_store(collection, chunked_documents)
-        create_vector_search_index(collection)
-        print(f"\nDone! {len(documents)} docs -> {len(chunked_documents)} chunks in {DB_NAME}.{COLLECTION_NAME}")
-    finally:
-        client.close()
+    sync_vector_store(collection, chunked_documents)
+    create_vector_search_index(collection)
+    print(f"\nDone! {len(documents)} docs -> {len(chunked_documents)} chunks in {DB_NAME}.{COLLECTION_NAME}")
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
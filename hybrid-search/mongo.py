@@ -0,0 +1,82 @@
+"""
+Shared MongoDB client - one pooled MongoClient per process.
+
+MongoClient is thread-safe and keeps its own connection pool, so every module
+reuses the same instance instead of paying TCP, handshake and server discovery
+on each call. The client is closed at interpreter exit. Async code gets its own
+AsyncMongoClient with the same pool settings.
+"""
+
+import atexit
+import os
+import threading
+from dotenv import load_dotenv
+
+from pymongo import AsyncMongoClient, MongoClient
+
+load_dotenv()
+
+# Configuration
+MONGO_DB_URL = os.getenv("MONGO_DB_URL", "mongodb://localhost:27017")
+
+# Connection pool settings (pymongo defaults: max 100, min 0)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """Return the process-wide MongoClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_DB_URL,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                )
+    return _client
+
+
+def close_mongo_client():
+    """Close the shared client (safe to call more than once)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_async_mongo_client() -> AsyncMongoClient:
+    """
+    Return the process-wide AsyncMongoClient (same pool settings) for asyncio code.
+    It binds to the event loop that first uses it, so use it from a single loop.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncMongoClient(
+                    MONGO_DB_URL,
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                )
+    return _async_client
+
+
+async def close_async_mongo_client():
+    """Close the shared async client; await this before the event loop shuts down."""
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
+atexit.register(close_mongo_client)
@@ -6,28 +6,42 @@ Why hybrid? Product docs need both:
 - Vector excels at semantic queries like "how do I configure webhooks?"
 """
 
+import asyncio
 import os
+import threading
+import time
 from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from dotenv import load_dotenv
 
 from langchain_mongodb import MongoDBAtlasVectorSearch
+from langchain_mongodb.utils import make_serializable
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
-from pymongo import MongoClient
 
-from embeddings import NomicEmbeddings
+from bm25 import BM25Engine, tokenize
+from cache import LRUCache
+from embeddings import NomicEmbeddings, get_embedding_cache, normalize_query
+from mongo import get_async_mongo_client, get_mongo_client
+from vector_index import IVFIndex, MemmapVectorIndex, load_or_build_ivf, load_or_export
 from questions import TEST_QUERIES
 
 load_dotenv()
 
 # Configuration (must match ingestion.py)
-MONGO_DB_URL = os.getenv("MONGO_DB_URL", "mongodb://localhost:27017")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "nomic-embed-text")
+# How long Ollama keeps the LLM loaded after a request ("30m", or seconds; -1 = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+if OLLAMA_KEEP_ALIVE.lstrip("-").isdigit():
+    OLLAMA_KEEP_ALIVE = int(OLLAMA_KEEP_ALIVE)
 
 DB_NAME = "product_docs_rag"
 COLLECTION_NAME = "hybrid_search"
 INDEX_NAME = "vector_index"
+INGEST_META_COLLECTION = "ingest_meta"
 
 # RRF constant k=60 is standard (from original RRF paper)
 RRF_K = 60
@@ -36,45 +50,292 @@ RRF_K = 60
 # Tune based on eval results. Vector-heavy since semantic queries dominate.
 HYBRID_WEIGHTS = [0.4, 0.6]
 
+# Fields BM25 needs; skipping the 768-float embedding cuts transfer and memory ~10x
+BM25_PROJECTION = {
+    "_id": 0, "text": 1, "source_file": 1, "chunk_index": 1, "title": 1, "module": 1, "route": 1, "linked_apis": 1,
+}
+BM25_BATCH_SIZE = int(os.getenv("BM25_BATCH_SIZE", "1000"))
 
-def get_mongo_client():
-    return MongoClient(MONGO_DB_URL)
+# "native" = in-house inverted index (bm25.py), "rank_bm25" = langchain BM25Retriever
+BM25_ENGINE = os.getenv("BM25_ENGINE", "native")
+
+# In-memory cache of query vectors, shared by every search in the process
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600")) or None
+query_embedding_cache = LRUCache(QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+
+# Vector backend: "atlas" ($vectorSearch in MongoDB), "numpy" (exact, in-process over a
+# memory-mapped export) or "ivf" (approximate, in-process; for millions of chunks)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "atlas")
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", Path(__file__).parent / ".cache" / "vector_index"))
+
+# IVF recall/latency knobs: lists at build time (0 = 4*sqrt(n)), lists probed per query
+IVF_LISTS = int(os.getenv("IVF_LISTS", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+
+# Full hybrid_search results, invalidated when the ingest epoch changes
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300")) or None
+result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+# How often a RetrievalSession checks the collection for changes (seconds)
+SESSION_REFRESH_SECONDS = float(os.getenv("SESSION_REFRESH_SECONDS", "5"))
+
+# Runs the vector leg of hybrid search while BM25 scores on the calling thread
+_search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_WORKERS", "8")), thread_name_prefix="hybrid-search"
+)
+
+
+def get_collection():
+    """Return the hybrid_search collection on the shared, pooled client."""
+    return get_mongo_client()[DB_NAME][COLLECTION_NAME]
+
+
+_embeddings = None
+
+
+def get_embeddings() -> NomicEmbeddings:
+    """Process-wide query embedder (shares the query vector cache)."""
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = NomicEmbeddings(
+            model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL,
+            cache=get_embedding_cache(), query_cache=query_embedding_cache
+        )
+    return _embeddings
 
 
 def get_vector_store():
     """Connect to MongoDB vector store."""
-    client = get_mongo_client()
-    collection = client[DB_NAME][COLLECTION_NAME]
-    embeddings = NomicEmbeddings(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL)
-    vector_store = MongoDBAtlasVectorSearch(
-        collection=collection, embedding=embeddings, index_name=INDEX_NAME
+    return MongoDBAtlasVectorSearch(
+        collection=get_collection(), embedding=get_embeddings(), index_name=INDEX_NAME
     )
-    return vector_store, client
 
 
-def load_documents_for_bm25() -> list[Document]:
-    """Load all documents from MongoDB for BM25 (requires docs in memory)."""
-    client = get_mongo_client()
-    collection = client[DB_NAME][COLLECTION_NAME]
-
-    try:
-        documents = []
-        for doc in collection.find():
-            if not doc.get("text"):
-                continue
-            documents.append(Document(
+def iter_documents_for_bm25(batch_size: int = BM25_BATCH_SIZE) -> Iterator[Document]:
+    """
+    Stream documents from MongoDB for BM25, fetching only text + metadata.
+    The cursor pulls `batch_size` documents per round trip.
+    """
+    cursor = get_collection().find(
+        {"text": {"$nin": [None, ""]}}, projection=BM25_PROJECTION, batch_size=batch_size
+    )
+    with cursor:
+        for doc in cursor:
+            yield Document(
                 page_content=doc["text"],
                 metadata={
                     "source_file": doc.get("source_file", "Unknown"),
+                    "chunk_index": doc.get("chunk_index"),
                     "title": doc.get("title", "Unknown"),
                     "module": doc.get("module"),
                     "route": doc.get("route"),
                     "linked_apis": doc.get("linked_apis", []),
                 }
-            ))
-        return documents
-    finally:
-        client.close()
+            )
+
+
+_local_index = {"index": None, "checked_at": 0.0}
+_local_index_lock = threading.Lock()
+
+
+def get_local_vector_index() -> MemmapVectorIndex:
+    """
+    Memory-mapped embedding export for the "numpy" backend.
+    Re-exported from MongoDB when the collection fingerprint changes
+    (checked at most every SESSION_REFRESH_SECONDS).
+    """
+    with _local_index_lock:
+        now = time.monotonic()
+        index = _local_index["index"]
+        if index is None or now - _local_index["checked_at"] >= SESSION_REFRESH_SECONDS:
+            collection = get_collection()
+            fingerprint = get_collection_fingerprint(collection)
+            if index is None or not index.matches(fingerprint):
+                index = load_or_export(collection, VECTOR_INDEX_DIR, fingerprint)
+            _local_index["index"] = index
+            _local_index["checked_at"] = now
+        return index
+
+
+_ivf_index = {"index": None}
+
+
+def get_ivf_index() -> IVFIndex:
+    """IVF index for the "ivf" backend, loaded from disk or built when the export changes."""
+    base = get_local_vector_index()
+    with _local_index_lock:
+        index = _ivf_index["index"]
+        if index is None or index.base is not base:
+            index = load_or_build_ivf(base, n_lists=IVF_LISTS or None, nprobe=IVF_NPROBE)
+            _ivf_index["index"] = index
+        return index
+
+
+def load_documents_for_bm25(batch_size: int = BM25_BATCH_SIZE) -> list[Document]:
+    """Load all documents from MongoDB for BM25 (requires docs in memory)."""
+    return list(iter_documents_for_bm25(batch_size=batch_size))
+
+
+def get_ingest_epoch(collection) -> int | None:
+    """Epoch that ingestion.py bumps whenever it changes the collection."""
+    meta = collection.database[INGEST_META_COLLECTION].find_one({"_id": collection.name})
+    return meta["epoch"] if meta else None
+
+
+def get_collection_fingerprint(collection) -> tuple:
+    """
+    Cheap change detector for the collection: (ingest epoch, document count, newest _id).
+    Count and newest _id also catch writes made outside ingestion.py.
+    """
+    newest = collection.find_one({}, projection={"_id": 1}, sort=[("_id", -1)])
+    return get_ingest_epoch(collection), collection.count_documents({}), newest["_id"] if newest else None
+
+
+class BM25Index:
+    """
+    BM25 index built once over a document list and queried many times.
+    Tokenization and IDF are computed at construction, not per query.
+    Both engines produce the same rankings; "native" only scores docs sharing a query term.
+    """
+
+    def __init__(self, documents: list[Document], engine: str = BM25_ENGINE):
+        self.documents = documents
+        self.engine = engine
+        if engine == "rank_bm25":
+            self._retriever = BM25Retriever.from_documents(documents)
+        elif engine == "native":
+            self._engine = BM25Engine([tokenize(doc.page_content) for doc in documents])
+        else:
+            raise ValueError(f"Unknown BM25 engine: {engine}")
+
+    def search(self, query: str, k: int = 5) -> list[Document]:
+        """Return the top-k documents for the query (safe to call from many threads)."""
+        if self.engine == "rank_bm25":
+            processed_query = self._retriever.preprocess_func(query)
+            return self._retriever.vectorizer.get_top_n(processed_query, self._retriever.docs, n=k)
+        return [self.documents[i] for i in self._engine.top_k(tokenize(query), k)]
+
+    def search_many(self, queries: list[str], k: int = 5) -> list[list[Document]]:
+        """search() for a batch of queries, scoring each distinct query term once."""
+        if self.engine == "rank_bm25":
+            return [self.search(query, k) for query in queries]
+        return [
+            [self.documents[i] for i in top]
+            for top in self._engine.top_k_many([tokenize(query) for query in queries], k)
+        ]
+
+
+class RetrievalSession:
+    """
+    Keeps the corpus and its BM25 index warm across questions.
+    The collection fingerprint is checked at most every `refresh_interval` seconds,
+    and documents are reloaded only when it changed.
+    """
+
+    def __init__(self, refresh_interval: float = SESSION_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._fingerprint = None
+        self._index = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> BM25Index:
+        """Reload documents if the collection changed (or if forced). Returns the BM25 index."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._index is not None and now - self._checked_at < self.refresh_interval:
+                return self._index
+
+            fingerprint = get_collection_fingerprint(get_collection())
+            self._checked_at = now
+            if force or fingerprint != self._fingerprint or self._index is None:
+                documents = load_documents_for_bm25()
+                if not documents:
+                    raise ValueError("No documents found. Run ingestion.py first!")
+                self._index = BM25Index(documents)
+                self._fingerprint = fingerprint
+            return self._index
+
+    @property
+    def fingerprint(self) -> tuple:
+        """Collection fingerprint the warm corpus was loaded at."""
+        self.refresh()
+        return self._fingerprint
+
+    @property
+    def bm25_index(self) -> BM25Index:
+        """Warm BM25 index over the current corpus."""
+        return self.refresh()
+
+    @property
+    def documents(self) -> list[Document]:
+        """Warm corpus as loaded for BM25."""
+        return self.refresh().documents
+
+    def hybrid_search(self, query: str, k: int = 5, weights: list[float] = None, timings: dict = None) -> list[Document]:
+        """hybrid_search() over this session's corpus."""
+        return hybrid_search(query, k=k, weights=weights, timings=timings, session=self)
+
+    def vector_search(self, query: str, k: int = 5) -> list[Document]:
+        """vector_search() (Atlas holds the vectors, so no local state is needed)."""
+        return vector_search(query, k=k)
+
+    def bm25_search(self, query: str, k: int = 5) -> list[Document]:
+        """bm25_search() over this session's corpus."""
+        return self.bm25_index.search(query, k=k)
+
+    def hybrid_search_many(self, queries: list[str], k: int = 5, weights: list[float] = None) -> list[list[Document]]:
+        """hybrid_search_many() over this session's corpus."""
+        return hybrid_search_many(queries, k=k, weights=weights, session=self)
+
+    def vector_search_many(self, queries: list[str], k: int = 5) -> list[list[Document]]:
+        """vector_search_many()."""
+        return vector_search_many(queries, k=k)
+
+    def bm25_search_many(self, queries: list[str], k: int = 5) -> list[list[Document]]:
+        """bm25_search_many() over this session's corpus."""
+        return self.bm25_index.search_many(queries, k=k)
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_default_session() -> RetrievalSession:
+    """Return the process-wide retrieval session."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = RetrievalSession()
+        return _default_session
+
+
+# BM25 index over an explicitly passed document list, rebuilt only when that list changes
+_bm25_cache = {"key": None, "index": None}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index(documents: list[Document] = None, session: RetrievalSession = None) -> BM25Index:
+    """
+    Return a warm BM25 index, building it on first use or when the data changed.
+
+    Args:
+        documents: Pre-loaded documents (optional). If omitted, the session's index is used.
+        session: Retrieval session tracking the collection (defaults to the process-wide one)
+    """
+    if documents is None:
+        return (session or get_default_session()).bm25_index
+    if not documents:
+        raise ValueError("No documents found. Run ingestion.py first!")
+
+    key = hash(tuple(doc.page_content for doc in documents))
+    with _bm25_lock:
+        if _bm25_cache["key"] != key:
+            _bm25_cache["index"] = BM25Index(documents)
+            _bm25_cache["key"] = key
+        return _bm25_cache["index"]
 
 
 def reciprocal_rank_fusion(
@@ -109,64 +370,251 @@ def reciprocal_rank_fusion(
     return [doc_map[key] for key in sorted_keys]
 
 
+def _timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _vector_search_by_vector(vector: list[float], k: int) -> list[Document]:
+    """Run the vector search for an embedded query on the configured backend."""
+    if VECTOR_BACKEND == "atlas":
+        return get_vector_store().similarity_search_by_vector(vector, k=k)
+    if VECTOR_BACKEND == "numpy":
+        return get_local_vector_index().search(vector, k=k)
+    if VECTOR_BACKEND == "ivf":
+        return get_ivf_index().search(vector, k=k)
+    raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+
+
+def _vector_leg(query: str, k: int) -> list[Document]:
+    """Embed the query and run the vector search on the configured backend."""
+    return _vector_search_by_vector(get_embeddings().embed_query(query), k)
+
+
+def _timed_vector_leg(query: str, k: int) -> tuple[list[Document], float, float]:
+    """_vector_leg that also returns (embed seconds, total seconds)."""
+    start = time.perf_counter()
+    vector = get_embeddings().embed_query(query)
+    embed_seconds = time.perf_counter() - start
+    return _vector_search_by_vector(vector, k), embed_seconds, time.perf_counter() - start
+
+
+def _vector_leg_many(queries: list[str], k: int) -> list[list[Document]]:
+    """Embed all queries in one batch, then run their vector searches together."""
+    vectors = get_embeddings().embed_queries(queries)
+    if VECTOR_BACKEND == "numpy":
+        return get_local_vector_index().search_many(vectors, k=k)
+    # Atlas: one $vectorSearch per query, issued concurrently on the pooled client
+    return list(_search_executor.map(lambda vector: _vector_search_by_vector(vector, k), vectors))
+
+
+def _result_cache_key(query: str, k: int, weights: list[float], fingerprint: tuple) -> tuple:
+    """
+    Result cache key: normalized query + every setting that changes the ranking + data version.
+    Only whitespace is normalized: BM25 tokens and query embeddings are case-sensitive,
+    and both legs already ignore spacing, so a hit returns what the uncached search would.
+    """
+    return normalize_query(query), k, tuple(weights), RRF_K, fingerprint
+
+
 def hybrid_search(
     query: str,
     k: int = 5,
     documents: list[Document] = None,
-    weights: list[float] = None
+    weights: list[float] = None,
+    timings: dict = None,
+    session: RetrievalSession = None
 ) -> list[Document]:
     """
     Hybrid search: BM25 + Vector + RRF fusion.
     Retrieves 3x candidates from each method, then RRF picks the best k.
+    The BM25 and vector legs run concurrently, so latency is ~max(bm25, vector).
+    Session-backed results are cached until the ingest epoch changes (or RESULT_CACHE_TTL).
 
     Args:
         query: Search query
         k: Number of results to return
-        documents: Pre-loaded documents for BM25 (optional, loads if not provided)
+        documents: Pre-loaded documents for BM25 (optional, uses the session's index if not provided)
         weights: [BM25_weight, Vector_weight] for RRF fusion. Defaults to HYBRID_WEIGHTS.
+        timings: Optional dict, filled with per-leg seconds ("bm25", "vector", "fusion", "total"),
+            "embed" (query embedding, part of "vector") and "cached" (True when served from the result cache)
+        session: Retrieval session holding the warm corpus (defaults to the process-wide one)
     """
     if weights is None:
         weights = HYBRID_WEIGHTS
     candidate_k = k * 3
+    start = time.perf_counter()
 
+    cache_key = None
     if documents is None:
-        documents = load_documents_for_bm25()
-    if not documents:
-        raise ValueError("No documents found. Run ingestion.py first!")
+        session = session or get_default_session()
+        cache_key = _result_cache_key(query, k, weights, session.fingerprint)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            if timings is not None:
+                timings.update({
+                    "bm25": 0.0, "vector": 0.0, "embed": 0.0, "fusion": 0.0,
+                    "total": time.perf_counter() - start, "cached": True,
+                })
+            return list(cached)
+
+    # Vector (semantic) leg in the background, BM25 (keyword matching) on this thread
+    vector_future = _search_executor.submit(_timed_vector_leg, query, candidate_k)
+    bm25_results, bm25_seconds = _timed(get_bm25_index(documents, session).search, query, k=candidate_k)
+    vector_results, embed_seconds, vector_seconds = vector_future.result()
 
-    # BM25 search (keyword matching)
-    bm25_retriever = BM25Retriever.from_documents(documents, k=candidate_k)
-    bm25_results = bm25_retriever.invoke(query)
+    # Combine with RRF (weights: [BM25, Vector])
+    combined, fusion_seconds = _timed(
+        reciprocal_rank_fusion, [bm25_results, vector_results], weights=weights
+    )
 
-    # Vector search (semantic)
-    vector_store, client = get_vector_store()
-    try:
-        vector_results = vector_store.as_retriever(search_kwargs={"k": candidate_k}).invoke(query)
-    finally:
-        client.close()
+    results = combined[:k]
+    if cache_key is not None:
+        result_cache.set(cache_key, results)
 
-    # Combine with RRF (weights: [BM25, Vector])
-    combined = reciprocal_rank_fusion([bm25_results, vector_results], weights=weights)
-    return combined[:k]
+    if timings is not None:
+        timings.update({
+            "bm25": bm25_seconds,
+            "vector": vector_seconds,
+            "embed": embed_seconds,
+            "fusion": fusion_seconds,
+            "total": time.perf_counter() - start,
+            "cached": False,
+        })
+    return list(results)
+
+
+def hybrid_search_many(
+    queries: list[str],
+    k: int = 5,
+    weights: list[float] = None,
+    session: RetrievalSession = None
+) -> list[list[Document]]:
+    """
+    hybrid_search for many queries at once (evals, offline jobs).
+    Queries are embedded in one batch, BM25 scores each distinct term once for the
+    whole batch, vector searches run concurrently, and RRF fuses each query.
+    Cached results are reused and fresh ones are cached, as in hybrid_search.
+    """
+    if weights is None:
+        weights = HYBRID_WEIGHTS
+    session = session or get_default_session()
+    candidate_k = k * 3
+
+    fingerprint = session.fingerprint
+    keys = [_result_cache_key(query, k, weights, fingerprint) for query in queries]
+    results = [result_cache.get(key) for key in keys]
+    todo = [i for i, cached in enumerate(results) if cached is None]
+
+    if todo:
+        todo_queries = [queries[i] for i in todo]
+        # BM25 in the background; the vector leg fans out on the pool itself, so it stays on this thread
+        bm25_future = _search_executor.submit(session.bm25_index.search_many, todo_queries, candidate_k)
+        vector_lists = _vector_leg_many(todo_queries, candidate_k)
+        bm25_lists = bm25_future.result()
+
+        for i, bm25_results, vector_results in zip(todo, bm25_lists, vector_lists):
+            results[i] = reciprocal_rank_fusion([bm25_results, vector_results], weights=weights)[:k]
+            result_cache.set(keys[i], results[i])
+
+    return [list(result) for result in results]
 
 
 def vector_search(query: str, k: int = 5) -> list[Document]:
     """Vector-only search (for comparison in evals)."""
-    vector_store, client = get_vector_store()
-    try:
-        return vector_store.as_retriever(search_kwargs={"k": k}).invoke(query)
-    finally:
-        client.close()
+    return _vector_leg(query, k)
 
 
-def bm25_search(query: str, k: int = 5, documents: list[Document] = None) -> list[Document]:
+def bm25_search(
+    query: str, k: int = 5, documents: list[Document] = None, session: RetrievalSession = None
+) -> list[Document]:
     """BM25-only search (for comparison in evals)."""
-    if documents is None:
-        documents = load_documents_for_bm25()
-    if not documents:
-        raise ValueError("No documents found. Run ingestion.py first!")
+    return get_bm25_index(documents, session).search(query, k=k)
 
-    return BM25Retriever.from_documents(documents, k=k).invoke(query)
+
+def vector_search_many(queries: list[str], k: int = 5) -> list[list[Document]]:
+    """vector_search for many queries (one embedding batch, concurrent searches)."""
+    return _vector_leg_many(queries, k)
+
+
+def bm25_search_many(
+    queries: list[str], k: int = 5, documents: list[Document] = None, session: RetrievalSession = None
+) -> list[list[Document]]:
+    """bm25_search for many queries in one pass over the index."""
+    return get_bm25_index(documents, session).search_many(queries, k=k)
+
+
+# Async API: one event loop can multiplex many in-flight questions.
+# Ollama and Atlas calls are native async; local CPU work (BM25, numpy/ivf backends)
+# and the occasional corpus reload run in worker threads.
+
+
+async def _atlas_vector_search(vector: list[float], k: int) -> list[Document]:
+    """$vectorSearch on the async client (same pipeline and output as MongoDBAtlasVectorSearch)."""
+    collection = get_async_mongo_client()[DB_NAME][COLLECTION_NAME]
+    cursor = await collection.aggregate([
+        {"$vectorSearch": {
+            "index": INDEX_NAME, "path": "embedding", "queryVector": vector,
+            "numCandidates": k * 10, "limit": k,
+        }},
+        {"$set": {"score": {"$meta": "vectorSearchScore"}}},
+        {"$project": {"embedding": 0}},
+    ])
+    # Same post-processing as similarity_search_by_vector: the score is dropped, _id becomes the Document id
+    documents = []
+    async for doc in cursor:
+        text = doc.pop("text")
+        doc.pop("score")
+        make_serializable(doc)
+        documents.append(Document(page_content=text, metadata=doc, id=doc["_id"]))
+    return documents
+
+
+async def avector_search(query: str, k: int = 5) -> list[Document]:
+    """Async vector_search."""
+    vector = await get_embeddings().aembed_query(query)
+    if VECTOR_BACKEND == "atlas":
+        return await _atlas_vector_search(vector, k)
+    return await asyncio.to_thread(_vector_search_by_vector, vector, k)
+
+
+async def abm25_search(
+    query: str, k: int = 5, documents: list[Document] = None, session: RetrievalSession = None
+) -> list[Document]:
+    """Async bm25_search (CPU-bound scoring runs in a worker thread)."""
+    return await asyncio.to_thread(bm25_search, query, k, documents, session)
+
+
+async def ahybrid_search(
+    query: str,
+    k: int = 5,
+    documents: list[Document] = None,
+    weights: list[float] = None,
+    session: RetrievalSession = None
+) -> list[Document]:
+    """Async hybrid_search: both legs are awaited concurrently, results share the result cache."""
+    if weights is None:
+        weights = HYBRID_WEIGHTS
+    candidate_k = k * 3
+
+    cache_key = None
+    if documents is None:
+        session = session or get_default_session()
+        cache_key = _result_cache_key(query, k, weights, await asyncio.to_thread(lambda: session.fingerprint))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+    bm25_results, vector_results = await asyncio.gather(
+        abm25_search(query, candidate_k, documents, session),
+        avector_search(query, candidate_k),
+    )
+    results = reciprocal_rank_fusion([bm25_results, vector_results], weights=weights)[:k]
+    if cache_key is not None:
+        result_cache.set(cache_key, results)
+    return list(results)
 
 
 def format_retrieved_context(documents: list[Document]) -> str:
@@ -194,9 +642,7 @@ def main():
     print("=" * 50)
 
     # Check we have data
-    client = get_mongo_client()
-    doc_count = client[DB_NAME][COLLECTION_NAME].count_documents({})
-    client.close()
+    doc_count = get_collection().count_documents({})
 
     if doc_count == 0:
         print("No documents found! Run ingestion.py first.")
@@ -204,19 +650,30 @@ def main():
 
     print(f"Found {doc_count} documents\n")
 
-    documents = load_documents_for_bm25()
+    session = RetrievalSession()
 
     for query in TEST_QUERIES:
         print(f"\nQuery: {query}")
         print("-" * 40)
 
-        bm25_results = bm25_search(query, k=3, documents=documents)
-        vector_results = vector_search(query, k=3)
-        hybrid_results = hybrid_search(query, k=3, documents=documents)
+        bm25_results = session.bm25_search(query, k=3)
+        vector_results = session.vector_search(query, k=3)
+        timings = {}
+        hybrid_results = session.hybrid_search(query, k=3, timings=timings)
 
         print("BM25:  ", [d.metadata.get("title", "?")[:30] for d in bm25_results])
         print("Vector:", [d.metadata.get("title", "?")[:30] for d in vector_results])
         print("Hybrid:", [d.metadata.get("title", "?")[:30] for d in hybrid_results])
+        print(
+            f"Timing: bm25={timings['bm25'] * 1000:.0f}ms vector={timings['vector'] * 1000:.0f}ms "
+            f"total={timings['total'] * 1000:.0f}ms"
+        )
+
+    print(f"\nQuery embedding cache: {query_embedding_cache.stats()}")
+    print(f"Result cache: {result_cache.stats()}")
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
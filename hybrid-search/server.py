@@ -0,0 +1,194 @@
+"""
+Retrieval / QA HTTP service - a long-running process with warm indices.
+
+Loads the corpus, BM25 index, MongoDB and Ollama clients and the LLM chain once
+at startup, then serves:
+
+    GET  /health
+    POST /search  {"query": "...", "k": 5}     -> hybrid_search results
+    POST /answer  {"question": "...", "k": 5}  -> generate_answer answer + sources
+
+Requests run on a bounded worker pool. Up to SERVER_QUEUE_SIZE more wait in a
+queue; beyond that the server answers 503 instead of piling up threads.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from dotenv import load_dotenv
+
+from generation import generate_answer, get_chain
+from retrieval import get_default_session, get_embeddings, hybrid_search, query_embedding_cache, result_cache
+
+load_dotenv()
+
+# Configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "64"))
+MAX_K = 50
+
+
+class BoundedPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed worker pool with a bounded queue."""
+
+    def __init__(self, address, handler, workers: int = SERVER_WORKERS, queue_size: int = SERVER_QUEUE_SIZE):
+        super().__init__(address, handler)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            body = json.dumps({"error": "Server busy, retry later"}).encode()
+            try:
+                # Drain the request briefly so closing doesn't reset the connection before the client reads the 503
+                request.settimeout(0.05)
+                try:
+                    request.recv(65536)
+                except OSError:
+                    pass
+                request.sendall(
+                    b"HTTP/1.0 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                    b"Retry-After: 1\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+            finally:
+                self.shutdown_request(request)
+            return
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def serialize_document(doc) -> dict:
+    """JSON view of a retrieved chunk."""
+    return {
+        "title": doc.metadata.get("title", "Unknown"),
+        "route": doc.metadata.get("route"),
+        "source_file": doc.metadata.get("source_file"),
+        "content": doc.page_content,
+    }
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over the warm retrieval session."""
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def do_GET(self):
+        if self.path == "/health":
+            # Cache sizes let load tests tell whether they measured the system or the caches
+            self._send_json(200, {
+                "status": "ok",
+                "result_cache_size": result_cache.max_entries,
+                "query_cache_size": query_embedding_cache.max_entries,
+            })
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        routes = {"/search": ("query", self._search), "/answer": ("question", self._answer)}
+        if self.path not in routes:
+            self._send_json(404, {"error": "Not found"})
+            return
+        field, route = routes[self.path]
+
+        try:
+            payload = self._read_json()
+            text = payload.get(field)
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError(f"'{field}' must be a non-empty string")
+            k = payload.get("k", 5)
+            # bool is an int subclass; floats and numeric strings are rejected rather than truncated
+            if not isinstance(k, int) or isinstance(k, bool):
+                raise ValueError("k must be an integer")
+            if not 1 <= k <= MAX_K:
+                raise ValueError(f"k must be between 1 and {MAX_K}")
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            start = time.perf_counter()
+            response = route(text, k)
+            response["latency_ms"] = (time.perf_counter() - start) * 1000
+            self._send_json(200, response)
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            self._send_json(500, {"error": str(e)})
+
+    def _search(self, query: str, k: int) -> dict:
+        documents = hybrid_search(query, k=k)
+        return {"results": [serialize_document(doc) for doc in documents]}
+
+    def _answer(self, question: str, k: int) -> dict:
+        result = generate_answer(question, k=k)
+        return {"answer": result["answer"], "sources": result["sources"]}
+
+
+def warm_up():
+    """Load everything that would otherwise be paid for by the first request."""
+    start = time.perf_counter()
+    session = get_default_session()
+    session.refresh(force=True)
+    get_embeddings()
+    get_chain()
+    print(f"Warm: {len(session.documents)} documents indexed in {time.perf_counter() - start:.1f}s")
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    """Run the HTTP service until interrupted."""
+    print("=" * 50)
+    print("RAG SERVICE")
+    print("=" * 50)
+
+    warm_up()
+    server = BoundedPoolHTTPServer((SERVER_HOST, SERVER_PORT), RAGRequestHandler)
+
+    # docker stop sends SIGTERM; treat it like Ctrl+C so shutdown is clean
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    print(f"Listening on http://{SERVER_HOST}:{SERVER_PORT} "
+          f"({SERVER_WORKERS} workers, queue {SERVER_QUEUE_SIZE})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Local vector backends - cosine search over a memory-mapped embedding matrix.
+
+For corpora that fit on one box this replaces the Atlas $vectorSearch round trip:
+all chunk embeddings are exported once into a contiguous float32 file (L2-normalised,
+so cosine similarity is a dot product) and memory-mapped.
+
+- MemmapVectorIndex: exact search, one matrix-vector product + argpartition
+- IVFIndex: approximate search for millions of chunks; a k-means coarse quantizer
+  splits rows into lists and only the `nprobe` closest lists are scored
+
+Run directly for an IVF recall/latency report against exact search:
+    python vector_index.py --nprobe 1 2 4 8 16
+"""
+
+import argparse
+import json
+import math
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+EMBEDDINGS_FILE = "embeddings.f32"
+DOCUMENTS_FILE = "documents.jsonl"
+META_FILE = "meta.json"
+IVF_FILE = "ivf.npz"
+# Stored in ivf.npz so a saved index is rebuilt when they change
+IVF_BUILD_PARAMS = ["n_lists", "iterations", "sample_size", "seed"]
+
+# Metadata kept next to each vector (same fields the BM25 loader uses)
+METADATA_FIELDS = ["source_file", "chunk_index", "title", "module", "route", "linked_apis"]
+
+
+def _jsonable_fingerprint(fingerprint: tuple) -> list:
+    """Collection fingerprints contain ObjectIds; store them as strings."""
+    return [value if value is None or isinstance(value, int) else str(value) for value in fingerprint]
+
+
+def export_embeddings(collection, directory: Path, fingerprint: tuple, batch_size: int = 1000) -> Path:
+    """
+    Stream every chunk's embedding out of MongoDB into `directory`.
+    Writes to a temporary directory first and swaps it in, so readers never see a partial export.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    count = 0
+    dim = None
+    projection = {"_id": 0, "text": 1, "embedding": 1, **{field: 1 for field in METADATA_FIELDS}}
+    cursor = collection.find(
+        {"text": {"$nin": [None, ""]}, "embedding": {"$exists": True}}, projection=projection, batch_size=batch_size
+    )
+    with cursor, open(tmp / EMBEDDINGS_FILE, "wb") as vectors_out, open(tmp / DOCUMENTS_FILE, "w") as docs_out:
+        for doc in cursor:
+            vector = np.asarray(doc["embedding"], dtype=np.float32)
+            if dim is None:
+                dim = vector.shape[0]
+            norm = np.linalg.norm(vector)
+            vectors_out.write((vector / norm if norm else vector).tobytes())
+            docs_out.write(json.dumps({
+                "text": doc["text"],
+                "metadata": {field: doc.get(field) for field in METADATA_FIELDS},
+            }) + "\n")
+            count += 1
+
+    (tmp / META_FILE).write_text(json.dumps({
+        "count": count,
+        "dim": dim or 0,
+        "fingerprint": _jsonable_fingerprint(fingerprint),
+        "fields": METADATA_FIELDS,
+    }))
+
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp.rename(directory)
+    return directory
+
+
+class MemmapVectorIndex:
+    """Exact cosine top-k over a memory-mapped, L2-normalised float32 matrix."""
+
+    def __init__(self, directory: Path):
+        directory = Path(directory)
+        self.directory = directory
+        self.meta = json.loads((directory / META_FILE).read_text())
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = (
+            np.memmap(directory / EMBEDDINGS_FILE, dtype=np.float32, mode="r", shape=(count, dim))
+            if count else np.zeros((0, dim), dtype=np.float32)
+        )
+        with open(directory / DOCUMENTS_FILE) as f:
+            self._records = [json.loads(line) for line in f]
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def matches(self, fingerprint: tuple) -> bool:
+        """True if the export was taken at this collection fingerprint with the current metadata fields."""
+        return (
+            self.meta["fingerprint"] == _jsonable_fingerprint(fingerprint)
+            and self.meta.get("fields") == METADATA_FIELDS
+        )
+
+    @staticmethod
+    def _normalise(query_vector) -> np.ndarray:
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    def search_ids(self, query_vector, k: int = 5) -> list[tuple[int, float]]:
+        """Return [(row, cosine similarity)] for the top-k rows, best first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        scores = self.vectors @ self._normalise(query_vector)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search_ids_many(self, query_vectors, k: int = 5, batch_size: int = 64) -> list[list[tuple[int, float]]]:
+        """search_ids for many queries, scoring up to `batch_size` queries per matrix product."""
+        k = min(k, len(self))
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if k <= 0 or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+
+        results = []
+        for start in range(0, len(queries), batch_size):
+            scores = self.vectors @ queries[start:start + batch_size].T
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            for column in range(scores.shape[1]):
+                rows = top[:, column]
+                rows = rows[np.argsort(-scores[rows, column], kind="stable")]
+                results.append([(int(row), float(scores[row, column])) for row in rows])
+        return results
+
+    def search_many(self, query_vectors, k: int = 5) -> list[list[Document]]:
+        """Top-k documents for each of many embedded queries."""
+        return [
+            [self.document(row, similarity) for row, similarity in hits]
+            for hits in self.search_ids_many(query_vectors, k)
+        ]
+
+    def document(self, row: int, similarity: float) -> Document:
+        """Build the result Document; score uses Atlas' cosine scale (1 + cos) / 2."""
+        record = self._records[row]
+        return Document(
+            page_content=record["text"],
+            metadata={**record["metadata"], "score": (1.0 + similarity) / 2.0}
+        )
+
+    def search(self, query_vector, k: int = 5) -> list[Document]:
+        """Top-k documents for an embedded query."""
+        return [self.document(row, similarity) for row, similarity in self.search_ids(query_vector, k)]
+
+
+def load_or_export(collection, directory: Path, fingerprint: tuple) -> MemmapVectorIndex:
+    """Load the export in `directory`, re-exporting first if it is missing or stale."""
+    directory = Path(directory)
+    if (directory / META_FILE).exists():
+        index = MemmapVectorIndex(directory)
+        if index.matches(fingerprint):
+            return index
+    print(f"Exporting embeddings to {directory}...")
+    return MemmapVectorIndex(export_embeddings(collection, directory, fingerprint))
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index on top of a MemmapVectorIndex.
+    Recall/latency trade-off: `n_lists` at build time, `nprobe` at query time.
+    """
+
+    def __init__(self, base: MemmapVectorIndex, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray,
+                 nprobe: int = 8, build_params: dict = None):
+        self.base = base
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.nprobe = nprobe
+        # Arguments build() was called with (n_lists=0 means "pick from the row count")
+        self.build_params = build_params or {}
+
+    @classmethod
+    def build(cls, base: MemmapVectorIndex, n_lists: int = None, iterations: int = 10,
+              sample_size: int = 100_000, nprobe: int = 8, seed: int = 0) -> "IVFIndex":
+        """Train spherical k-means on a sample of rows, then assign every row to its closest list."""
+        build_params = {"n_lists": n_lists or 0, "iterations": iterations, "sample_size": sample_size, "seed": seed}
+        rng = np.random.default_rng(seed)
+        count = len(base)
+        if count == 0:
+            raise ValueError("Cannot build an IVF index over an empty export")
+
+        sample = np.asarray(base.vectors[np.sort(rng.choice(count, min(count, sample_size), replace=False))])
+        n_lists = min(n_lists or max(1, int(4 * math.sqrt(count))), len(sample))
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        assign = np.concatenate([
+            np.argmax(base.vectors[start:start + 65536] @ centroids.T, axis=1)
+            for start in range(0, count, 65536)
+        ])
+        ids = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+        return cls(base, centroids.astype(np.float32), offsets, ids, nprobe=nprobe, build_params=build_params)
+
+    def save(self, path: Path = None) -> Path:
+        """Save next to the export it was built from (a re-export removes it)."""
+        path = Path(path or self.base.directory / IVF_FILE)
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, ids=self.ids, **self.build_params)
+        return path
+
+    @classmethod
+    def load(cls, base: MemmapVectorIndex, path: Path = None, nprobe: int = 8) -> "IVFIndex":
+        """Load an index saved by save() for this export."""
+        data = np.load(Path(path or base.directory / IVF_FILE))
+        build_params = {name: int(data[name]) for name in IVF_BUILD_PARAMS if name in data.files}
+        return cls(base, data["centroids"], data["offsets"], data["ids"], nprobe=nprobe, build_params=build_params)
+
+    def search_ids(self, query_vector, k: int = 5, nprobe: int = None) -> list[tuple[int, float]]:
+        """Return [(row, cosine similarity)] for the approximate top-k rows, best first."""
+        query = self.base._normalise(query_vector)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self.ids[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+        k = min(k, len(candidates))
+        if k <= 0:
+            return []
+        candidates.sort()  # sequential reads from the memory map
+        scores = self.base.vectors[candidates] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def search(self, query_vector, k: int = 5) -> list[Document]:
+        """Approximate top-k documents for an embedded query."""
+        return [self.base.document(row, similarity) for row, similarity in self.search_ids(query_vector, k)]
+
+
+def load_or_build_ivf(base: MemmapVectorIndex, n_lists: int = None, nprobe: int = 8, iterations: int = 10,
+                      sample_size: int = 100_000, seed: int = 0) -> IVFIndex:
+    """
+    Load the IVF index saved with this export, building and saving it if missing
+    or if it was built with different parameters (e.g. IVF_LISTS changed).
+    """
+    if (base.directory / IVF_FILE).exists():
+        index = IVFIndex.load(base, nprobe=nprobe)
+        expected = {"n_lists": n_lists or 0, "iterations": iterations, "sample_size": sample_size, "seed": seed}
+        if index.build_params == expected:
+            return index
+    print(f"Building IVF index over {len(base)} vectors...")
+    index = IVFIndex.build(base, n_lists=n_lists, nprobe=nprobe, iterations=iterations,
+                           sample_size=sample_size, seed=seed)
+    index.save()
+    return index
+
+
+def recall_report(index: IVFIndex, query_vectors, k: int = 10, nprobes: list[int] = (1, 2, 4, 8, 16)) -> list[dict]:
+    """Recall@k of IVF search against exact search, with mean latency, per nprobe."""
+    exact = []
+    start = time.perf_counter()
+    for query in query_vectors:
+        exact.append({row for row, _ in index.base.search_ids(query, k)})
+    exact_ms = (time.perf_counter() - start) * 1000 / max(len(exact), 1)
+
+    report = []
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        for query, truth in zip(query_vectors, exact):
+            hits += len(truth & {row for row, _ in index.search_ids(query, k, nprobe=nprobe)})
+        elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(exact), 1)
+        report.append({
+            "nprobe": nprobe,
+            "recall": hits / max(sum(len(truth) for truth in exact), 1),
+            "ivf_ms": elapsed_ms,
+            "exact_ms": exact_ms,
+        })
+    return report
+
+
+def main():
+    """Print an IVF recall report for the current collection."""
+    from questions import EVAL_QUESTIONS, TEST_QUERIES
+    from retrieval import IVF_LISTS, get_embeddings, get_local_vector_index
+
+    parser = argparse.ArgumentParser(description="IVF recall/latency vs exact search")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--sample-docs", type=int, default=0,
+                        help="Use N stored chunk vectors as queries instead of embedding the eval questions")
+    args = parser.parse_args()
+
+    base = get_local_vector_index()
+    index = load_or_build_ivf(base, n_lists=IVF_LISTS or None)
+    if args.sample_docs:
+        rows = np.random.default_rng(0).choice(len(base), min(args.sample_docs, len(base)), replace=False)
+        queries = [np.asarray(base.vectors[row]) for row in rows]
+    else:
+        queries = [get_embeddings().embed_query(q) for q in EVAL_QUESTIONS + TEST_QUERIES]
+
+    print(f"{len(base)} vectors, {len(index.centroids)} lists, {len(queries)} queries, k={args.k}")
+    print(f"{'nprobe':>6} {'recall':>8} {'ivf ms':>8} {'exact ms':>9}")
+    for row in recall_report(index, queries, k=args.k, nprobes=args.nprobe):
+        print(f"{row['nprobe']:>6} {row['recall']:>8.1%} {row['ivf_ms']:>8.2f} {row['exact_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()